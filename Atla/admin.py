@@ -2,86 +2,30 @@ from django.contrib import admin, messages
 from django.template.response import TemplateResponse
 from django.urls import path
 from django.shortcuts import redirect
-from django.http import HttpResponse, HttpResponseForbidden
-from io import BytesIO
-from datetime import date
-from openpyxl import Workbook, load_workbook
-from .models import ResourceType, WaterType, Object, PriorityScore, Region
-from .services.priority import calculate_priority_score
-from .models import PriorityLevel
+from django.http import HttpResponseForbidden
+from .models import ResourceType, WaterType, Object, Region, Job, AIRiskAssessment
+from .services.recalc import recalculate_priorities
+from .services.xlsx import (
+    OBJECT_XLSX_HEADERS,
+    export_objects_response,
+    import_object_rows,
+    open_objects_workbook,
+)
 
 
 @admin.action(description="Пересчитать приоритет для выбранных объектов")
 def recalc_priority(modeladmin, request, queryset):
-    for obj in queryset:
-        score = calculate_priority_score(obj, today=date.today())
-
-        if score >= 12:
-            level = PriorityLevel.HIGH
-        elif score >= 6:
-            level = PriorityLevel.MEDIUM
-        else:
-            level = PriorityLevel.LOW
-
-        priority_obj, _ = PriorityScore.objects.get_or_create(obj=obj)
-        priority_obj.score = score
-        priority_obj.level = level
-        priority_obj.save()
-
-        obj.priority = score
-        obj.save(update_fields=["priority"])
+    result = recalculate_priorities(queryset)
+    modeladmin.message_user(
+        request,
+        f"Пересчитано объектов: {result['processed']} ({result['rows_per_second']} строк/с).",
+        messages.SUCCESS,
+    )
 
 
 @admin.action(description="Экспортировать выбранные объекты в XLSX")
 def export_objects_xls(modeladmin, request, queryset):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Objects"
-
-    headers = [
-        "id",
-        "name",
-        "region_id",
-        "resource_type_id",
-        "water_type_id",
-        "fauna",
-        "passport_date",
-        "technical_condition",
-        "latitude",
-        "longitude",
-        "pdf",
-        "priority",
-        "created_at",
-    ]
-    ws.append(headers)
-
-    for obj in queryset.select_related("region", "resource_type", "water_type"):
-        ws.append([
-            obj.id,
-            obj.name,
-            obj.region_id,
-            obj.resource_type_id,
-            obj.water_type_id,
-            obj.fauna,
-            obj.passport_date.isoformat() if obj.passport_date else None,
-            obj.technical_condition,
-            float(obj.latitude) if obj.latitude is not None else None,
-            float(obj.longitude) if obj.longitude is not None else None,
-            obj.pdf.name if obj.pdf else "",
-            obj.priority,
-            obj.created_at.isoformat() if obj.created_at else None,
-        ])
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    response["Content-Disposition"] = 'attachment; filename="objects.xlsx"'
-    return response
+    return export_objects_response(queryset)
 
 
 @admin.register(Object)
@@ -107,84 +51,23 @@ class ObjectAdmin(admin.ModelAdmin):
                 return redirect("..")
 
             try:
-                wb = load_workbook(upload)
-                ws = wb.active
+                wb, ws, header = open_objects_workbook(upload)
             except Exception as exc:
                 messages.error(request, f"Некорректный файл XLSX: {exc}")
                 return redirect("..")
 
-            header = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1, values_only=False))]
-            expected_headers = [
-                "id",
-                "name",
-                "region_id",
-                "resource_type_id",
-                "water_type_id",
-                "fauna",
-                "passport_date",
-                "technical_condition",
-                "latitude",
-                "longitude",
-                "pdf",
-                "priority",
-                "created_at",
-            ]
-            if header != expected_headers:
-                messages.error(request, f"Неверные заголовки. Ожидались: {expected_headers}. Получены: {header}")
-                return redirect("..")
+            try:
+                if header != OBJECT_XLSX_HEADERS:
+                    messages.error(request, f"Неверные заголовки. Ожидались: {OBJECT_XLSX_HEADERS}. Получены: {header}")
+                    return redirect("..")
+
+                result = import_object_rows(ws.iter_rows(min_row=2, values_only=True))
+            finally:
+                wb.close()
 
-            created = 0
-            updated = 0
-            errors = []
-
-            for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                if all(cell is None for cell in row):
-                    continue
-                try:
-                    (
-                        obj_id,
-                        name,
-                        region_id,
-                        resource_type_id,
-                        water_type_id,
-                        fauna,
-                        passport_date,
-                        technical_condition,
-                        latitude,
-                        longitude,
-                        _pdf_name,
-                        priority,
-                        _created_at,
-                    ) = row
-
-                    region = Region.objects.get(pk=region_id)
-                    resource_type = ResourceType.objects.get(pk=resource_type_id)
-                    water_type = WaterType.objects.get(pk=water_type_id)
-
-                    obj_data = {
-                        "name": name,
-                        "region": region,
-                        "resource_type": resource_type,
-                        "water_type": water_type,
-                        "fauna": bool(fauna),
-                        "passport_date": passport_date,
-                        "technical_condition": int(technical_condition) if technical_condition is not None else 0,
-                        "latitude": latitude,
-                        "longitude": longitude,
-                        "priority": int(priority) if priority is not None else 0,
-                    }
-
-                    if obj_id:
-                        obj = Object.objects.get(pk=obj_id)
-                        for field, value in obj_data.items():
-                            setattr(obj, field, value)
-                        obj.save()
-                        updated += 1
-                    else:
-                        Object.objects.create(**obj_data)
-                        created += 1
-                except Exception as exc:
-                    errors.append({"row": idx, "error": str(exc)})
+            created = result["created"]
+            updated = result["updated"]
+            errors = result["errors"]
 
             if created or updated:
                 messages.success(request, f"Импорт завершён: создано {created}, обновлено {updated}.")
@@ -204,3 +87,17 @@ admin.site.register(Region)
 
 admin.site.register(ResourceType)
 admin.site.register(WaterType)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "processed", "total", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("started_at", "finished_at", "created_at")
+
+
+@admin.register(AIRiskAssessment)
+class AIRiskAssessmentAdmin(admin.ModelAdmin):
+    list_display = ("obj", "risk_prob", "model", "analyzed_at")
+    list_filter = ("model",)
+    readonly_fields = ("fingerprint", "analyzed_at")
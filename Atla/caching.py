@@ -0,0 +1,162 @@
+import hashlib
+import time
+import uuid
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from GidroAtlas.db_router import primary_reads_since
+
+# Кэшированные ответы справочников живут не дольше суток даже без изменений
+REFERENCE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _version_key(model):
+    return f"atla:table:{model._meta.label_lower}"
+
+
+def table_version(model):
+    """
+    Текущая версия таблицы: (token, last_modified — unix time).
+    Меняется bump_table_version() при любом изменении строк таблицы.
+    """
+    key = _version_key(model)
+    version = cache.get(key)
+    if version is None:
+        # версия потерялась (очистка кэша) — начинаем новую, клиенты просто получат 200
+        version = _next_version(None)
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_table_version(*models):
+    """
+    Сбрасывает версии таблиц после коммита текущей транзакции (вне транзакции — сразу):
+    иначе клиент мог бы получить новую версию вместе со старыми данными и закэшировать их.
+    """
+    def bump():
+        for model in models:
+            key = _version_key(model)
+            cache.set(key, _next_version(cache.get(key)), None)
+
+    transaction.on_commit(bump)
+
+
+def _next_version(previous):
+    # Last-Modified точен до секунды: версия помечается следующей секундой и всегда
+    # позже предыдущей, иначе запись в ту же секунду, что и прошлый ответ, дала бы
+    # клиенту с одним If-Modified-Since 304 на устаревшие данные
+    last_modified = int(time.time()) + 1
+    if previous is not None:
+        last_modified = max(last_modified, previous[1] + 1)
+    return uuid.uuid4().hex[:12], last_modified
+
+
+def etag_for(model, token):
+    return f'W/"{model._meta.model_name}-{token}"'
+
+
+def tables_version(models):
+    """
+    Общая версия нескольких таблиц (ответ зависит от всех): (token, last_modified).
+    """
+    versions = [table_version(model) for model in models]
+    if len(versions) == 1:
+        return versions[0]
+    token = hashlib.md5(":".join(token for token, _ in versions).encode()).hexdigest()[:12]
+    return token, max(last_modified for _, last_modified in versions)
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    304, если у клиента актуальная версия (If-None-Match / If-Modified-Since), иначе None.
+    """
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    # клиент может хранить ответ, но обязан каждый раз перепроверять его по ETag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+class CachedReferenceMixin:
+    """
+    Read-through кэш для list/retrieve почти статичных справочников.
+
+    Ответ хранится в кэше Django под ключом версии таблицы и полного URL (с хостом),
+    поэтому повторные запросы не ходят в БД, а при неизменной версии
+    отдаётся 304. Версия сбрасывается сигналами save/delete модели.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(request, lambda: super(CachedReferenceMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(request, lambda: super(CachedReferenceMixin, self).retrieve(request, *args, **kwargs))
+
+    def _cached_response(self, request, render):
+        model = self.get_queryset().model
+        token, last_modified = table_version(model)
+        etag = etag_for(model, token)
+
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+
+        # полный URL со схемой и хостом: в ответе абсолютные ссылки пагинации next/previous
+        path_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        key = f"atla:ref:{model._meta.label_lower}:{token}:{path_hash}"
+        data = cache.get(key)
+        if data is None:
+            with primary_reads_since(last_modified):
+                response = render()
+            if response.status_code == 200:
+                cache.set(key, response.data, REFERENCE_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+
+        return set_validators(response, etag, last_modified)
+
+
+class ConditionalMixin:
+    """
+    ETag / Last-Modified для list/retrieve по версиям таблиц из etag_models.
+
+    Версии лежат в кэше и сбрасываются при любой записи (сигналы и пакетные
+    сервисы), поэтому проверка If-None-Match / If-Modified-Since не делает
+    запросов к БД и отвечает 304 до фильтрации и сериализатора.
+    Пока реплика может отставать от свежей версии, ответ читается с основной БД.
+    В etag_models перечисляются все таблицы, данные которых попадают в ответ
+    ("app_label.ModelName" или класс модели).
+    """
+
+    etag_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, lambda: super(ConditionalMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, lambda: super(ConditionalMixin, self).retrieve(request, *args, **kwargs))
+
+    def conditional(self, request, render):
+        models = [apps.get_model(model) if isinstance(model, str) else model for model in self.etag_models]
+        token, last_modified = tables_version(models)
+        etag = etag_for(models[0], token)
+
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+
+        with primary_reads_since(last_modified):
+            response = render()
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from GidroAtlas.middleware import timed
+from GidroAtlas.pagination import count_from
+
+from .serializer import sparse_fields
+
+# Поля сериализатора, значения которых нужно преобразовать (остальные отдаются из БД как есть)
+CONVERTED_FIELDS = (serializers.DateTimeField, serializers.DateField, serializers.DecimalField)
+
+
+class FastListMixin:
+    """
+    Быстрый list() только для чтения: строки берутся из .values() и собираются
+    в словари заранее подготовленными функциями, без экземпляров моделей и
+    to_representation сериализатора на каждое поле.
+
+    Схема ответа та же, что у serializer_class: порядок полей и преобразования
+    (даты, Decimal) берутся из полей сериализатора.
+    fast_columns — поле ответа → колонка values(); вычисляемые поля —
+    методы fast_<поле>(row), которые получают словарь строки.
+    ?fast=0 или FAST_LIST_PATH = False — обычный путь через сериализатор.
+    """
+
+    fast_columns = {}
+    fast_extra_columns = ()
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, "FAST_LIST_PATH", True) or request.query_params.get("fast") == "0":
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        getters = self.fast_getters(request)
+
+        columns = list(dict.fromkeys([*self.fast_columns.values(), *self.fast_extra_columns]))
+        # поля сортировки (в том числе аннотации вроде distance_sq) нужны keyset-пагинации
+        for field in queryset.query.order_by:
+            if isinstance(field, str) and field.lstrip("-") not in columns and field.lstrip("-") != "pk":
+                columns.append(field.lstrip("-"))
+        # COUNT(*) страницы — по queryset без JOIN колонок values()
+        rows = count_from(queryset.values(*columns), queryset)
+
+        page = self.paginate_queryset(rows)
+        with timed("serializer"):
+            data = [{name: get(row) for name, get in getters} for row in (page if page is not None else rows)]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def fast_getters(self, request):
+        """
+        [(поле ответа, функция(row))] в порядке полей сериализатора, с учётом ?fields= / ?omit=.
+        """
+        fields = self.get_serializer_class()().fields
+        getters = []
+        for name in sparse_fields(request, fields):
+            if name in self.fast_columns:
+                get = itemgetter(self.fast_columns[name])
+                if isinstance(fields[name], CONVERTED_FIELDS):
+                    get = _converted(get, compile_converter(fields[name]))
+                getters.append((name, get))
+            elif hasattr(self, f"fast_{name}"):
+                getters.append((name, getattr(self, f"fast_{name}")))
+            else:
+                raise ImproperlyConfigured(f"{type(self).__name__}: no fast path for field {name!r}")
+        return getters
+
+
+def compile_converter(field):
+    """
+    to_representation поля сериализатора, подготовленный один раз на запрос:
+    часовой пояс не ищется на каждой строке, Decimal форматируется напрямую.
+    Результат тот же, что у самого поля.
+    """
+    if isinstance(field, serializers.DateTimeField):
+        return serializers.DateTimeField(
+            format=getattr(field, "format", empty),
+            default_timezone=getattr(field, "timezone", None) or field.default_timezone(),
+        ).to_representation
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if isinstance(field, serializers.DecimalField) and coerce_to_string and not field.localize \
+            and not field.normalize_output and field.decimal_places is not None and field.rounding is None:
+        exponent = Decimal(1).scaleb(-field.decimal_places)
+        # значения из БД уже с нужным числом знаков — quantize ничего не округляет, только гарантирует формат
+        return lambda value: format(value.quantize(exponent), "f")
+    return field.to_representation
+
+
+def _converted(get, convert):
+    def getter(row):
+        value = get(row)
+        return None if value is None else convert(value)
+    return getter
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Atla.models import Job, JobKind, JobStatus
+from Atla.services.jobs import run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Ежедневное старение приоритетов: пересчёт объектов, у которых сегодня «день рождения» паспорта. "
+        "Пропущенные с прошлого запуска дни догоняются автоматически. Запускать раз в сутки (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, help="Дата расчёта в формате YYYY-MM-DD")
+        parser.add_argument("--since", type=date.fromisoformat, help="Последний обработанный день (по умолчанию — из прошлого запуска)")
+
+    def handle(self, *args, **options):
+        today = options["date"] or date.today()
+        params = {"date": today.isoformat()}
+        if options["since"]:
+            params["since"] = options["since"].isoformat()
+
+        # запуск записывается в очередь задач — по нему следующий запуск находит точку отсчёта
+        job = Job.objects.create(
+            kind=JobKind.AGE_PRIORITIES,
+            status=JobStatus.RUNNING,
+            params=params,
+            started_at=timezone.now(),
+        )
+        job = run_job(job)
+
+        if job.status != JobStatus.DONE:
+            raise CommandError(job.error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитано объектов: {job.result['processed']} (с {job.params['since'] or today}), "
+            f"обновлено: {job.result['updated']} за {job.result['seconds']} с"
+        ))
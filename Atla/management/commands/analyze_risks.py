@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Atla.models import Object
+from Atla.services.ai_priority import analyze_objects
+
+ANALYZE_CHUNK_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = "ИИ-оценка риска для объектов: параллельные запросы, для неизменившихся объектов используется сохранённый ответ."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--region", type=int, help="Только объекты региона (id)")
+        parser.add_argument("--workers", type=int, help="Число одновременных запросов к ИИ")
+        parser.add_argument("--chunk-size", type=int, default=ANALYZE_CHUNK_SIZE)
+        parser.add_argument("--force", action="store_true", help="Запросить заново даже актуальные ответы")
+
+    def handle(self, *args, **options):
+        queryset = (
+            Object.objects
+            .select_related("priority_score", "region", "resource_type", "water_type")
+            .order_by("pk")
+        )
+        if options["region"]:
+            queryset = queryset.filter(region_id=options["region"])
+
+        started = time.monotonic()
+        processed = failed = 0
+        chunk = []
+        for obj in queryset.iterator(chunk_size=options["chunk_size"]):
+            chunk.append(obj)
+            if len(chunk) >= options["chunk_size"]:
+                done = self._analyze(chunk, options["workers"], options["force"])
+                processed += done
+                failed += len(chunk) - done
+                chunk = []
+        if chunk:
+            done = self._analyze(chunk, options["workers"], options["force"])
+            processed += done
+            failed += len(chunk) - done
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Оценено: {processed}, ошибок: {failed} за {round(time.monotonic() - started, 1)} с"
+        ))
+
+    @staticmethod
+    def _analyze(objects, workers, force):
+        items = [(obj, getattr(getattr(obj, "priority_score", None), "score", obj.priority)) for obj in objects]
+        return len(analyze_objects(items, max_workers=workers, force=force))
@@ -0,0 +1,220 @@
+import io
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from Atla.models import Object, Region
+from Atla.services.recalc import recalculate_priorities
+from Atla.services.synthetic import NAME_STEMS, generate_dataset, parse_scale
+from Atla.services.xlsx import write_objects_xlsx
+
+BENCHMARK_USER = "benchmark@example.com"
+BENCHMARK_PASSWORD = "benchmark-password"
+
+# Объектов в файле сценария импорта XLSX
+IMPORT_ROWS = 1000
+
+# Тяжёлые сценарии выполняются один раз, сколько бы ни было --repeat
+SINGLE_RUN = {"xlsx_export", "xlsx_import", "recalc_all"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Воспроизводимый бенчмарк: создаёт тестовую БД, заполняет её синтетическими данными "
+        "(--scale 10k/100k/1m, --seed), прогоняет сценарии API и пишет результаты в JSON. "
+        "--compare сравнивает с прошлым результатом."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", default="10k", help="10k, 100k, 1m или число объектов")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого лёгкого сценария")
+        parser.add_argument("--scenario", action="append", help="Только указанные сценарии (можно несколько)")
+        parser.add_argument("--output", help="Файл результатов, по умолчанию benchmark-<scale>.json")
+        parser.add_argument("--compare", help="JSON прошлого запуска для сравнения медиан")
+        parser.add_argument("--keepdb", action="store_true", help="Не удалять тестовую БД (повторный запуск без генерации)")
+
+    def handle(self, *args, **options):
+        try:
+            count = parse_scale(options["scale"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        scenarios = self.scenarios()
+        selected = options["scenario"] or list(scenarios)
+        unknown = sorted(set(selected) - set(scenarios))
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}. Available: {', '.join(scenarios)}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        test_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            # отдельный кэш в памяти: версии ETag и тайлы не смешиваются с рабочим кэшем;
+            # тестовая БД создаётся только для default — чтения с реплики выключены
+            with override_settings(
+                CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+                DATABASE_REPLICAS=[],
+            ):
+                dataset = self.prepare(count, options["seed"])
+                results = {
+                    name: self.run(name, scenarios[name], 1 if name in SINGLE_RUN else options["repeat"])
+                    for name in selected
+                }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        report = {
+            "meta": self.meta(options, test_name),
+            "dataset": dataset,
+            "scenarios": results,
+        }
+        output = options["output"] or f"benchmark-{options['scale']}.json"
+        with open(output, "w", encoding="utf-8") as fileobj:
+            json.dump(report, fileobj, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Результаты: {output}"))
+
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def prepare(self, count, seed):
+        existing = Object.objects.count()
+        started = time.perf_counter()
+        if existing != count:
+            if existing:
+                raise CommandError(f"Test database already has {existing} objects, expected {count}; run without --keepdb")
+            generate_dataset(count, seed, progress=lambda done: self.stdout.write(f"  сгенерировано {done}/{count}"))
+        if not get_user_model().objects.filter(email=BENCHMARK_USER).exists():
+            get_user_model().objects.create_user(BENCHMARK_USER, BENCHMARK_PASSWORD)
+
+        self.client = Client()
+        self.rng = random.Random(seed)
+        self.ids = list(Object.objects.order_by("pk").values_list("pk", flat=True))
+        self.regions = list(Region.objects.order_by("pk").values_list("pk", flat=True))
+        return {
+            "objects": count,
+            "seed": seed,
+            "generate_seconds": round(time.perf_counter() - started, 3) if existing != count else None,
+        }
+
+    def scenarios(self):
+        return {
+            "objects_list": lambda: self.get("/atla/objects/"),
+            "objects_list_fast_off": lambda: self.get("/atla/objects/?fast=0"),
+            "objects_list_not_modified": self.not_modified,
+            "objects_deep_cursor": self.deep_cursor,
+            "objects_filter_region": lambda: self.get(f"/atla/objects/?region={self.rng.choice(self.regions)}"),
+            "objects_filter_bbox": lambda: self.get("/atla/objects/?bbox=76,43,78,45"),
+            "objects_search": lambda: self.get(f"/atla/objects/?search={self.rng.choice(NAME_STEMS)[:4]}"),
+            "objects_autocomplete": lambda: self.get(f"/atla/objects/autocomplete/?q={self.rng.choice(NAME_STEMS)[:3]}"),
+            "priority_by_object": lambda: self.get(f"/atla/priority-scores/{self.rng.choice(self.ids)}/by-object/"),
+            "login": self.login,
+            "xlsx_export": lambda: self.get("/atla/objects/export_xls/", stream=True),
+            "xlsx_import": self.xlsx_import,
+            "recalc_all": lambda: recalculate_priorities(),
+        }
+
+    def run(self, name, scenario, repeat):
+        scenario()  # прогрев: соединение, кэши, импорты
+        # запросы считаются отдельным прогоном: в замерах журнал SQL выключен
+        with CaptureQueriesContext(connection) as ctx:
+            scenario()
+        queries = len(ctx.captured_queries)
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            scenario()
+            timings.append(time.perf_counter() - started)
+
+        timings.sort()
+        result = {
+            "runs": repeat,
+            "median_ms": round(statistics.median(timings) * 1000, 3),
+            "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+            "min_ms": round(timings[0] * 1000, 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))] * 1000, 3),
+            "max_ms": round(timings[-1] * 1000, 3),
+            "queries": queries,
+        }
+        self.stdout.write(f"{name}: median {result['median_ms']} ms, p95 {result['p95_ms']} ms, {queries} queries")
+        return result
+
+    def get(self, path, stream=False, **headers):
+        response = self.client.get(path, **headers)
+        if response.status_code not in (200, 304):
+            raise CommandError(f"GET {path}: HTTP {response.status_code}")
+        if stream:
+            b"".join(response.streaming_content)
+        return response
+
+    def not_modified(self):
+        if not hasattr(self, "_etag"):
+            self._etag = self.get("/atla/objects/")["ETag"]
+        self.get("/atla/objects/", HTTP_IF_NONE_MATCH=self._etag)
+
+    def deep_cursor(self):
+        # пять страниц подряд в keyset-режиме
+        url = "/atla/objects/?pagination=cursor"
+        for _ in range(5):
+            url = self.get(url).json()["next"]
+            if not url:
+                break
+
+    def login(self):
+        response = self.client.post("/user/login/", {"email": BENCHMARK_USER, "password": BENCHMARK_PASSWORD})
+        if response.status_code != 200:
+            raise CommandError(f"login: HTTP {response.status_code}")
+
+    def xlsx_import(self):
+        # реальный файл экспорта: строки с существующими id, часть — с изменённым состоянием
+        buffer = io.BytesIO()
+        sample = sorted(self.rng.sample(self.ids, min(IMPORT_ROWS, len(self.ids))))
+        write_objects_xlsx(Object.objects.filter(pk__in=sample), buffer)
+        buffer.seek(0)
+        buffer.name = "objects.xlsx"
+        response = self.client.post("/atla/objects/import_xls/", {"file": buffer})
+        if response.status_code != 200:
+            raise CommandError(f"import_xls: HTTP {response.status_code} {response.content[:200]!r}")
+
+    def meta(self, options, test_name):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=settings.BASE_DIR, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "scale": options["scale"],
+            "repeat": options["repeat"],
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        }
+
+    def compare(self, path, results):
+        with open(path, encoding="utf-8") as fileobj:
+            previous = json.load(fileobj)["scenarios"]
+        self.stdout.write(f"Сравнение с {path} (медиана, было → стало):")
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            before, after = previous[name]["median_ms"], result["median_ms"]
+            ratio = after / before if before else float("inf")
+            self.stdout.write(f"  {name}: {before} → {after} ms (x{ratio:.2f})")
@@ -0,0 +1,50 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Atla.services.priority import FORMULAS, get_formula
+
+# Генераторы синтетических колонок для полей, которые встречаются в формулах
+SYNTHETIC_COLUMNS = {
+    "passport_date": lambda rng, n: [date(1960, 1, 1) + timedelta(days=rng.randrange(23000)) for _ in range(n)],
+    "technical_condition": lambda rng, n: [rng.randint(1, 5) for _ in range(n)],
+}
+
+
+class Command(BaseCommand):
+    help = "Пропускная способность формулы приоритета на синтетических колонках (строк/с), без БД."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--formula", action="append", help=f"Версия формулы ({', '.join(FORMULAS)}); по умолчанию все")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        for version in options["formula"] or list(FORMULAS):
+            try:
+                formula = get_formula(version)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+            missing = [field for field in formula.fields if field not in SYNTHETIC_COLUMNS]
+            if missing:
+                self.stderr.write(f"{version}: нет генератора для полей {missing}, пропуск")
+                continue
+
+            rng = random.Random(options["seed"])
+            columns = {field: SYNTHETIC_COLUMNS[field](rng, rows) for field in formula.fields}
+
+            started = time.perf_counter()
+            scores = formula.scores(columns)
+            scored = time.perf_counter()
+            levels = [formula.level(score) for score in scores]
+            finished = time.perf_counter()
+
+            self.stdout.write(
+                f"{version}: {len(levels)} строк, score {scored - started:.3f} с "
+                f"({round(rows / (scored - started)):,} строк/с), "
+                f"score+level {finished - started:.3f} с ({round(rows / (finished - started)):,} строк/с)"
+            )
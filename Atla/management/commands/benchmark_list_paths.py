@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+DEFAULT_URLS = ("/atla/objects/", "/atla/priority-scores/")
+
+
+class Command(BaseCommand):
+    help = "Сравнение запросов/с для списков: обычный сериализатор (?fast=0) и быстрый путь (values() + orjson)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", action="append", help="URL списка (можно несколько), по умолчанию объекты и приоритеты")
+        parser.add_argument("--requests", type=int, default=50, help="Запросов на каждый вариант")
+        parser.add_argument("--page-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        client = Client()
+        for url in options["url"] or DEFAULT_URLS:
+            separator = "&" if "?" in url else "?"
+            base = f"{url}{separator}page_size={options['page_size']}"
+            results = {}
+            for label, path in (("serializer", base + "&fast=0"), ("fast", base)):
+                response = client.get(path)
+                if response.status_code != 200:
+                    self.stderr.write(f"{path}: HTTP {response.status_code}")
+                    break
+                started = time.perf_counter()
+                for _ in range(options["requests"]):
+                    client.get(path)
+                results[label] = options["requests"] / (time.perf_counter() - started)
+
+            if len(results) == 2:
+                self.stdout.write(
+                    f"{url}: serializer {results['serializer']:.1f} req/s, fast {results['fast']:.1f} req/s "
+                    f"(x{results['fast'] / results['serializer']:.1f})"
+                )
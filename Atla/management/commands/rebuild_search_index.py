@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from Atla.services.search import fts_available, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Полная пересборка индекса поиска по названиям объектов (FTS5 и триграммы)."
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        mode = "FTS5 + триграммы" if fts_available() else "триграммы"
+        self.stdout.write(self.style.SUCCESS(f"Индекс поиска пересобран ({mode})"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Atla.services.stats import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = "Полная пересборка сводной таблицы дашборда (ObjectStatistic) из объектов."
+
+    def handle(self, *args, **options):
+        rows = rebuild_statistics()
+        self.stdout.write(self.style.SUCCESS(f"Сводка пересобрана: {rows} строк"))
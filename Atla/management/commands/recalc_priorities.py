@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from Atla.models import Object
+from Atla.services.recalc import RECALC_BATCH_SIZE, recalculate_priorities
+
+
+class Command(BaseCommand):
+    help = "Массовый пересчёт приоритетов (PriorityScore и Object.priority) для всех объектов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=RECALC_BATCH_SIZE)
+        parser.add_argument("--region", type=int, help="Пересчитать только объекты региона (id)")
+        parser.add_argument("--date", type=date.fromisoformat, help="Дата расчёта в формате YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        queryset = Object.objects.all()
+        if options["region"]:
+            queryset = queryset.filter(region_id=options["region"])
+
+        result = recalculate_priorities(
+            queryset,
+            today=options["date"],
+            batch_size=options["batch_size"],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано: {result['processed']}, создано: {result['created']}, "
+            f"обновлено: {result['updated']} за {result['seconds']} с "
+            f"({result['rows_per_second']} строк/с)"
+        ))
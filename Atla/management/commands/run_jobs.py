@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Atla.services.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Воркер фоновых задач (импорт/экспорт XLSX, пересчёт приоритетов). Для нескольких ядер запускайте несколько процессов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Выполнить все задачи из очереди и выйти")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Пауза между опросами пустой очереди, с")
+
+    def handle(self, *args, **options):
+        run_worker(once=options["once"], sleep=options["sleep"])
@@ -0,0 +1,35 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Atla.models import Object
+from Atla.services.priority import FORMULAS
+from Atla.services.recalc import RECALC_BATCH_SIZE, shadow_evaluate
+
+
+class Command(BaseCommand):
+    help = "Теневая оценка версии формулы приоритета по всей таблице без записи: сравнение с текущими PriorityScore."
+
+    def add_arguments(self, parser):
+        parser.add_argument("version", help=f"Версия формулы ({', '.join(FORMULAS)})")
+        parser.add_argument("--region", type=int, help="Только объекты региона (id)")
+        parser.add_argument("--date", type=date.fromisoformat, help="Дата расчёта в формате YYYY-MM-DD")
+        parser.add_argument("--batch-size", type=int, default=RECALC_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = Object.objects.all()
+        if options["region"]:
+            queryset = queryset.filter(region_id=options["region"])
+
+        try:
+            result = shadow_evaluate(
+                options["version"],
+                queryset,
+                today=options["date"],
+                batch_size=options["batch_size"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
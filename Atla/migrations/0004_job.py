@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0003_alter_object_pdf_alter_object_water_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('import_xls', 'Импорт XLSX'), ('export_xls', 'Экспорт XLSX'), ('recalc_priorities', 'Пересчёт приоритетов')], max_length=30)),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('input_file', models.FileField(blank=True, null=True, upload_to='jobs/input/')),
+                ('total', models.IntegerField(blank=True, null=True)),
+                ('processed', models.IntegerField(default=0)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('result_file', models.FileField(blank=True, null=True, upload_to='jobs/result/')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='Atla_job_status_d8675b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0004_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['latitude', 'longitude'], name='Atla_object_latitud_2befcc_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0005_object_lat_lon_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['priority', 'id'], name='Atla_object_priorit_c6ed7f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['created_at', 'id'], name='Atla_object_created_dc88b8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='priorityscore',
+            index=models.Index(fields=['score', 'id'], name='Atla_priori_score_70a78d_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 20:40
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_statistics(apps, schema_editor):
+    Object = apps.get_model("Atla", "Object")
+    PriorityScore = apps.get_model("Atla", "PriorityScore")
+    ObjectStatistic = apps.get_model("Atla", "ObjectStatistic")
+
+    totals = Object.objects.aggregate(count=Count("pk"), condition_sum=Sum("technical_condition"))
+    rows = [ObjectStatistic(dimension="total", key="", count=totals["count"], condition_sum=totals["condition_sum"] or 0)]
+    for field, dimension in (("region_id", "region"), ("resource_type_id", "resource_type")):
+        for row in Object.objects.order_by().values(field).annotate(count=Count("pk"), condition_sum=Sum("technical_condition")):
+            rows.append(ObjectStatistic(dimension=dimension, key=str(row[field]), count=row["count"], condition_sum=row["condition_sum"] or 0))
+    for row in PriorityScore.objects.order_by().values("level").annotate(count=Count("pk")):
+        rows.append(ObjectStatistic(dimension="level", key=row["level"], count=row["count"]))
+    ObjectStatistic.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0006_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObjectStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('total', 'Всего'), ('region', 'Регион'), ('resource_type', 'Тип ресурса'), ('level', 'Уровень приоритета')], max_length=20)),
+                ('key', models.CharField(blank=True, default='', max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('condition_sum', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='atla_objectstatistic_dimension_key')],
+            },
+        ),
+        migrations.RunPython(build_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0007_objectstatistic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIRiskAssessment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('risk_prob', models.FloatField(blank=True, null=True)),
+                ('explanation', models.TextField(blank=True, default='')),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('model', models.CharField(max_length=100)),
+                ('analyzed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('obj', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ai_risk', to='Atla.object')),
+            ],
+        ),
+    ]
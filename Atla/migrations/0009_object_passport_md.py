@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 20:45
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractDay, ExtractMonth
+
+
+def fill_passport_md(apps, schema_editor):
+    Object = apps.get_model("Atla", "Object")
+    Object.objects.update(passport_md=ExtractMonth("passport_date") * 100 + ExtractDay("passport_date"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0008_airiskassessment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='object',
+            name='passport_md',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(fill_passport_md, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('import_xls', 'Импорт XLSX'), ('export_xls', 'Экспорт XLSX'), ('recalc_priorities', 'Пересчёт приоритетов'), ('age_priorities', 'Ежедневное старение приоритетов')], max_length=30),
+        ),
+    ]
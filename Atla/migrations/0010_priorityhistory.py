@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-18 20:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LEVEL_CODES = {"low": 0, "medium": 1, "high": 2}
+
+
+def seed_history(apps, schema_editor):
+    # текущий приоритет становится первой точкой истории
+    PriorityScore = apps.get_model("Atla", "PriorityScore")
+    PriorityHistory = apps.get_model("Atla", "PriorityHistory")
+
+    rows = PriorityScore.objects.values_list(
+        "obj_id", "obj__region_id", "updated_at", "score", "level", "formula_version",
+    ).iterator(chunk_size=2000)
+    batch = []
+    for obj_id, region_id, updated_at, score, level, formula_version in rows:
+        batch.append(PriorityHistory(
+            obj_id=obj_id,
+            region_id=region_id,
+            date=updated_at.date(),
+            score=score,
+            level=LEVEL_CODES.get(level, 0),
+            formula_version=formula_version,
+        ))
+        if len(batch) >= 2000:
+            PriorityHistory.objects.bulk_create(batch)
+            batch = []
+    PriorityHistory.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0009_object_passport_md'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriorityHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('score', models.SmallIntegerField()),
+                ('level', models.PositiveSmallIntegerField()),
+                ('formula_version', models.CharField(max_length=20)),
+                ('obj', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='priority_history', to='Atla.object')),
+                ('region', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='Atla.region')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['region', 'date'], name='Atla_priori_region__d7be9d_idx'), models.Index(fields=['date'], name='Atla_priori_date_018f03_idx')],
+                'constraints': [models.UniqueConstraint(fields=('obj', 'date'), name='atla_priorityhistory_obj_date')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 6.0 on 2026-10-18 20:50
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# ё → е, как в Atla.services.search.normalize (регистр FTS5 приводит сам)
+FTS_NAME = "replace(replace({}.name, 'ё', 'е'), 'Ё', 'Е')"
+
+FTS_SQL = [
+    """CREATE VIRTUAL TABLE atla_object_fts USING fts5(
+        name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER atla_object_fts_insert AFTER INSERT ON Atla_object BEGIN
+        INSERT INTO atla_object_fts(rowid, name) VALUES (new.id, {FTS_NAME.format('new')});
+    END""",
+    """CREATE TRIGGER atla_object_fts_delete AFTER DELETE ON Atla_object BEGIN
+        DELETE FROM atla_object_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER atla_object_fts_update AFTER UPDATE OF name ON Atla_object BEGIN
+        UPDATE atla_object_fts SET name = {FTS_NAME.format('new')} WHERE rowid = new.id;
+    END""",
+    f"INSERT INTO atla_object_fts(rowid, name) SELECT id, {FTS_NAME.format('Atla_object')} FROM Atla_object",
+]
+
+FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS atla_object_fts_insert",
+    "DROP TRIGGER IF EXISTS atla_object_fts_delete",
+    "DROP TRIGGER IF EXISTS atla_object_fts_update",
+    "DROP TABLE IF EXISTS atla_object_fts",
+]
+
+
+def _trigrams(text):
+    result = set()
+    for word in re.findall(r"\w+", (text or "").casefold().replace("ё", "е")):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других БД поиск работает по триграммам
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in FTS_SQL:
+            schema_editor.execute(sql)
+
+    Object = apps.get_model("Atla", "Object")
+    ObjectNameTrigram = apps.get_model("Atla", "ObjectNameTrigram")
+    rows = []
+    for pk, name in Object.objects.values_list("pk", "name").iterator(chunk_size=2000):
+        rows.extend(ObjectNameTrigram(obj_id=pk, trigram=trigram) for trigram in _trigrams(name))
+        if len(rows) >= 10000:
+            ObjectNameTrigram.objects.bulk_create(rows)
+            rows = []
+    ObjectNameTrigram.objects.bulk_create(rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in FTS_DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0010_priorityhistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObjectNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('obj', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Atla.object')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'obj'], name='Atla_object_trigram_b215ab_idx')],
+                'constraints': [models.UniqueConstraint(fields=('obj', 'trigram'), name='atla_objectnametrigram_obj_trigram')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0011_object_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['region', 'priority', 'id'], name='Atla_object_region__22fdf4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['resource_type', 'priority', 'id'], name='Atla_object_resourc_4b41a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['water_type', 'priority', 'id'], name='Atla_object_water_t_6a60cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['passport_date'], name='Atla_object_passpor_7f8710_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='priorityscore',
+            index=models.Index(fields=['level', 'score', 'id'], name='Atla_priori_level_4fee36_idx'),
+        ),
+    ]
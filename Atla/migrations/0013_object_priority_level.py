@@ -0,0 +1,64 @@
+# Generated by Django 6.0 on 2026-10-18 21:11
+
+from django.db import migrations, models
+
+LEVEL_CODES = {"low": 0, "medium": 1, "high": 2}
+
+# SQLite добавляет NOT NULL колонку пересозданием Atla_object, а вместе со старой
+# таблицей удаляются и триггеры FTS-индекса названий (0011) — создаём их заново
+FTS_NAME = "replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е')"
+
+FTS_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS atla_object_fts_insert",
+    "DROP TRIGGER IF EXISTS atla_object_fts_delete",
+    "DROP TRIGGER IF EXISTS atla_object_fts_update",
+    f"""CREATE TRIGGER atla_object_fts_insert AFTER INSERT ON Atla_object BEGIN
+        INSERT INTO atla_object_fts(rowid, name) VALUES (new.id, {FTS_NAME});
+    END""",
+    """CREATE TRIGGER atla_object_fts_delete AFTER DELETE ON Atla_object BEGIN
+        DELETE FROM atla_object_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER atla_object_fts_update AFTER UPDATE OF name ON Atla_object BEGIN
+        UPDATE atla_object_fts SET name = {FTS_NAME} WHERE rowid = new.id;
+    END""",
+]
+
+
+def restore_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in FTS_TRIGGERS_SQL:
+            schema_editor.execute(sql)
+
+
+def fill_priority_level(apps, schema_editor):
+    Object = apps.get_model("Atla", "Object")
+    for level, code in LEVEL_CODES.items():
+        if code:
+            Object.objects.filter(priority_score__level=level).update(priority_level=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Atla', '0012_filter_indexes'),
+    ]
+
+    operations = [
+        # при откате RemoveField тоже пересоздаёт таблицу — триггеры восстанавливаются после него
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name='object',
+            name='priority_level',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Низкий'), (1, 'Средний'), (2, 'Высокий')], default=0, editable=False),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(fill_priority_level, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['priority_level', 'priority', 'id'], name='Atla_object_priorit_1e2a31_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='object',
+            index=models.Index(fields=['region', 'priority_level', 'priority', 'id'], name='Atla_object_region__3cacb1_idx'),
+        ),
+    ]
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from datetime import date
-from .services.priority import calculate_priority_score
+from .services.priority import get_formula, passport_month_day
 
 
 class Region(models.Model):
@@ -19,6 +20,20 @@ class WaterType(models.Model):
     def __str__(self):
         return self.name
     
+class PriorityLevel(models.TextChoices):
+    LOW = "low", _("Низкий")
+    MEDIUM = "medium", _("Средний")
+    HIGH = "high", _("Высокий")
+
+
+# уровни в числовых колонках хранятся кодами: «не ниже среднего» — level >= 1
+LEVEL_CODES = {PriorityLevel.LOW: 0, PriorityLevel.MEDIUM: 1, PriorityLevel.HIGH: 2}
+LEVEL_NAMES = {code: level for level, code in LEVEL_CODES.items()}
+
+# Колонки Object, которые ведёт сервис пересчёта (services/recalc.py)
+DERIVED_PRIORITY_FIELDS = ("priority", "priority_level")
+
+
 # Create your models here.
 class Object(models.Model):
     name = models.CharField(max_length=100)
@@ -27,21 +42,78 @@ class Object(models.Model):
     water_type = models.ForeignKey(WaterType, on_delete=models.CASCADE, null=True, blank=True)
     fauna = models.BooleanField(default=True)
     passport_date = models.DateField()
+    # месяц и день паспорта (MMDD) — ежедневное «старение» выбирает объекты по индексу
+    passport_md = models.PositiveSmallIntegerField(default=0, db_index=True, editable=False)
     technical_condition = models.IntegerField(default=0)
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
     pdf = models.FileField(upload_to='passports/', null=True, blank=True)
     priority = models.IntegerField(default=0)
+    # код уровня приоритета (LEVEL_CODES) рядом с priority: фильтр и сортировка без JOIN PriorityScore,
+    # пишется сервисом пересчёта тем же UPDATE, что и priority
+    priority_level = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        choices=[(code, PriorityLevel(level).label) for level, code in LEVEL_CODES.items()],
+    )
     created_at = models.DateTimeField(auto_now_add=True, null=True)
 
+    class Meta:
+        indexes = [
+            # фильтр по видимой области карты (bbox) и по радиусу
+            models.Index(fields=["latitude", "longitude"]),
+            # сортировки keyset-пагинации: (priority, id) и (created_at, id)
+            models.Index(fields=["priority", "id"]),
+            models.Index(fields=["created_at", "id"]),
+            # фильтры ObjectFilter вместе с сортировкой списка (-priority, -id): без сортировки во временном B-tree
+            models.Index(fields=["region", "priority", "id"]),
+            models.Index(fields=["resource_type", "priority", "id"]),
+            models.Index(fields=["water_type", "priority", "id"]),
+            # диапазон passport_date_after / passport_date_before
+            models.Index(fields=["passport_date"]),
+            # «высокий риск» на карте и «высокий в регионе X по score» — один проход по диапазону индекса
+            models.Index(fields=["priority_level", "priority", "id"]),
+            models.Index(fields=["region", "priority_level", "priority", "id"]),
+        ]
+
     def __str__(self):
         return self.name
 
-class PriorityLevel(models.TextChoices):
-    LOW = "low", _("Низкий")
-    MEDIUM = "medium", _("Средний")
-    HIGH = "high", _("Высокий")
+    def save(self, *args, **kwargs):
+        self.passport_md = passport_month_day(self.passport_date)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "passport_date" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "passport_md"}
+        elif update_fields is None and not self._state.adding and not args and not kwargs.get("force_insert"):
+            # priority и priority_level пишет только пересчёт: значения в памяти могли устареть
+            # (пересчёт после коммита обновляет строку, а не этот экземпляр).
+            # Как и любой save(update_fields=...), сохранение экземпляра, чья строка уже удалена,
+            # поднимает DatabaseError, а не вставляет её заново; для вставки — save(force_insert=True)
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in DERIVED_PRIORITY_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+        # записанные значения — новая точка отсчёта для сигналов следующего save() этого экземпляра
+        written = kwargs.get("update_fields")
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            **getattr(self, "_loaded_values", {}),
+            **{
+                field.attname: getattr(self, field.attname)
+                for field in self._meta.concrete_fields
+                if field.attname not in deferred
+                and (written is None or field.name in written or field.attname in written)
+            },
+        }
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # значения на момент загрузки — сигналы сравнивают с ними, что изменилось
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
 class PriorityScore(models.Model):
     obj = models.OneToOneField(
@@ -69,33 +141,233 @@ class PriorityScore(models.Model):
     # Дата автоматического обновления
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # сортировка списка и keyset-пагинации по (score, id)
+            models.Index(fields=["score", "id"]),
+            # ?level= с той же сортировкой
+            models.Index(fields=["level", "score", "id"]),
+        ]
+
     def __str__(self):
         return f"{self.obj.name} — {self.score} ({self.level})"
 
     # Основной метод пересчёта
     def recalc(self, today: date | None = None, save: bool = True):
         """
-        Пересчитать score и level на основе объекта.
+        Пересчитать score и level на основе объекта по активной формуле.
         """
-        score = calculate_priority_score(self.obj, today=today)
+        formula = get_formula()
+        score = formula.scores({field: [getattr(self.obj, field)] for field in formula.fields}, today)[0]
         self.score = score
-        self.level = self._detect_level(score)
+        self.level = formula.level(score)
+        self.formula_version = formula.version
 
         if save:
-            self.save()
+            with transaction.atomic():
+                self.save()
+                # тот же score и уровень на объекте (фильтры и сортировка списка)
+                Object.objects.filter(pk=self.obj_id).update(priority=score, priority_level=LEVEL_CODES[self.level])
 
         return self.score, self.level
 
     @staticmethod
     def _detect_level(score: int) -> str:
         """
-        Классификация по ТЗ:
+        Уровень по порогам активной формулы (для v1 по ТЗ):
         • ≥ 12 → Высокий
         • 6–11 → Средний
         • < 6 → Низкий
         """
-        if score >= 12:
-            return PriorityLevel.HIGH
-        if score >= 6:
-            return PriorityLevel.MEDIUM
-        return PriorityLevel.LOW
\ No newline at end of file
+        return PriorityLevel(get_formula().level(score))
+
+
+class PriorityHistory(models.Model):
+    """
+    История приоритета: одна строка на изменение score/уровня (не на каждый пересчёт),
+    не больше одной строки на объект в день. Пишется сервисом пересчёта.
+    """
+
+    # уровни хранятся кодами: сравнение «стало хуже» — просто level > level
+    LEVEL_CODES = LEVEL_CODES
+    LEVEL_NAMES = LEVEL_NAMES
+
+    obj = models.ForeignKey(
+        Object,
+        on_delete=models.CASCADE,
+        related_name="priority_history",
+        db_index=False,
+    )
+    # регион на момент изменения — для выборок по региону без JOIN
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
+    score = models.SmallIntegerField()
+    level = models.PositiveSmallIntegerField()
+    formula_version = models.CharField(max_length=20)
+
+    class Meta:
+        constraints = [
+            # заодно индекс для выборки истории объекта за период
+            models.UniqueConstraint(fields=["obj", "date"], name="atla_priorityhistory_obj_date"),
+        ]
+        indexes = [
+            models.Index(fields=["region", "date"]),
+            models.Index(fields=["date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.obj_id} {self.date}: {self.score} ({self.level_name})"
+
+    @property
+    def level_name(self) -> str:
+        return self.LEVEL_NAMES[self.level]
+
+
+class ObjectNameTrigram(models.Model):
+    """
+    Триграммы нормализованного названия объекта — нечёткий поиск с опечатками
+    (и полнотекстовый поиск на БД без FTS5). Поддерживается сервисом поиска.
+    """
+
+    obj = models.ForeignKey(Object, on_delete=models.CASCADE, related_name="+", db_index=False)
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["obj", "trigram"], name="atla_objectnametrigram_obj_trigram"),
+        ]
+        indexes = [
+            models.Index(fields=["trigram", "obj"]),
+        ]
+
+    def __str__(self):
+        return f"{self.obj_id}: {self.trigram!r}"
+
+
+class AIRiskAssessment(models.Model):
+    """
+    Последний ответ ИИ по объекту. Повторный запрос нужен, только если
+    изменился отпечаток входных данных (fingerprint) или истёк TTL.
+    """
+
+    obj = models.OneToOneField(
+        Object,
+        on_delete=models.CASCADE,
+        related_name="ai_risk"
+    )
+
+    # Ответ модели: вероятность риска (0–1) и пояснение
+    risk_prob = models.FloatField(null=True, blank=True)
+    explanation = models.TextField(blank=True, default="")
+
+    # sha256 полей объекта, попавших в промпт, и имени модели
+    fingerprint = models.CharField(max_length=64)
+    model = models.CharField(max_length=100)
+
+    analyzed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.obj_id} — {self.risk_prob} ({self.model})"
+
+    def is_fresh(self, fingerprint: str, ttl, now=None) -> bool:
+        """
+        Ответ актуален: входные данные не менялись и TTL (timedelta) не истёк.
+        """
+        now = now or timezone.now()
+        return self.fingerprint == fingerprint and self.analyzed_at + ttl > now
+
+class JobKind(models.TextChoices):
+    IMPORT_XLS = "import_xls", _("Импорт XLSX")
+    EXPORT_XLS = "export_xls", _("Экспорт XLSX")
+    RECALC_PRIORITIES = "recalc_priorities", _("Пересчёт приоритетов")
+    AGE_PRIORITIES = "age_priorities", _("Ежедневное старение приоритетов")
+
+
+class JobStatus(models.TextChoices):
+    PENDING = "pending", _("В очереди")
+    RUNNING = "running", _("Выполняется")
+    DONE = "done", _("Готово")
+    FAILED = "failed", _("Ошибка")
+
+
+class Job(models.Model):
+    """
+    Фоновая задача (очередь в БД). Выполняется процессом `manage.py run_jobs`.
+    """
+
+    kind = models.CharField(max_length=30, choices=JobKind.choices)
+    status = models.CharField(
+        max_length=10,
+        choices=JobStatus.choices,
+        default=JobStatus.PENDING,
+    )
+
+    # Параметры задачи и исходный файл (для импорта)
+    params = models.JSONField(default=dict, blank=True)
+    input_file = models.FileField(upload_to="jobs/input/", null=True, blank=True)
+
+    # Прогресс
+    total = models.IntegerField(null=True, blank=True)
+    processed = models.IntegerField(default=0)
+
+    # Результат: отчёт и/или файл для скачивания
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.FileField(upload_to="jobs/result/", null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Признак жизни воркера: задачу без него дольше JOB_STALE_TIMEOUT снимает reap_stale_jobs()
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Сколько раз задачу брали в работу (повтор после гибели воркера)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+    @property
+    def rows_per_second(self) -> float | None:
+        if not self.started_at:
+            return None
+        end = self.finished_at or timezone.now()
+        seconds = (end - self.started_at).total_seconds()
+        if seconds <= 0:
+            return None
+        return round(self.processed / seconds, 1)
+
+
+class StatDimension(models.TextChoices):
+    TOTAL = "total", _("Всего")
+    REGION = "region", _("Регион")
+    RESOURCE_TYPE = "resource_type", _("Тип ресурса")
+    LEVEL = "level", _("Уровень приоритета")
+
+
+class ObjectStatistic(models.Model):
+    """
+    Сводка для дашборда: счётчики объектов по срезам.
+    Поддерживается инкрементально (сигналы, массовые операции),
+    полная пересборка — `manage.py rebuild_statistics`.
+    """
+
+    dimension = models.CharField(max_length=20, choices=StatDimension.choices)
+    # id справочника или код уровня; для total — пустая строка
+    key = models.CharField(max_length=50, blank=True, default="")
+    count = models.IntegerField(default=0)
+    # сумма technical_condition — среднее считается как condition_sum / count
+    condition_sum = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "key"], name="atla_objectstatistic_dimension_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}:{self.key} = {self.count}"
@@ -1,26 +1,82 @@
 from rest_framework import serializers
-from .models import ResourceType, WaterType, Object, PriorityScore, Region
+from django.core.exceptions import ObjectDoesNotExist
+from django.urls import reverse
+from .models import ResourceType, WaterType, Object, PriorityScore, PriorityHistory, Region, Job, AIRiskAssessment
+from GidroAtlas.middleware import timed
 
+from .services.ai_priority import is_stale
 
-class RegionSerializer(serializers.ModelSerializer):
+
+def sparse_fields(request, names):
+    """
+    Поля ответа с учётом ?fields=id,name (только перечисленные) и ?omit=pdf_url (без указанных).
+    Действует только на чтение (GET/HEAD), чтобы не терять поля при записи.
+    """
+    if request is None or request.method not in ("GET", "HEAD"):
+        return list(names)
+    params = getattr(request, "query_params", request.GET)
+    fields = _field_names(params.get("fields"))
+    omit = _field_names(params.get("omit"))
+    return [name for name in names if (not fields or name in fields) and name not in omit]
+
+
+def _field_names(value):
+    return {name.strip() for name in (value or "").split(",") if name.strip()}
+
+
+_datetime_field = serializers.DateTimeField()
+
+
+def ai_risk_representation(entry, obj, score):
+    """
+    Сохранённая ИИ-оценка в ответе объекта (общая для сериализатора и быстрого пути списка).
+    """
+    return {
+        "risk_prob": entry.risk_prob,
+        "explanation": entry.explanation,
+        "analyzed_at": _datetime_field.to_representation(entry.analyzed_at),
+        "stale": is_stale(entry, obj, score),
+    }
+
+
+class SparseFieldsMixin:
+    """
+    Поддержка ?fields= / ?omit= (см. sparse_fields). Лишние поля удаляются
+    до сериализации, поэтому их SerializerMethodField не вычисляются.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = set(sparse_fields(self.context.get("request"), self.fields))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        # время сериализации попадает в Server-Timing и /api/metrics/ (вложенные не суммируются дважды)
+        with timed("serializer"):
+            return super().to_representation(instance)
+
+
+class RegionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Region
         fields = "__all__"
 
 
-class ResourceTypeSerializer(serializers.ModelSerializer):
+class ResourceTypeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ResourceType
         fields = '__all__'
 
 
-class WaterTypeSerializer(serializers.ModelSerializer):
+class WaterTypeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = WaterType
         fields = '__all__'
 
 
-class PriorityScoreSerializer(serializers.ModelSerializer):
+class PriorityScoreSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     object_id = serializers.PrimaryKeyRelatedField(
         source="obj",
         read_only=True
@@ -32,7 +88,18 @@ class PriorityScoreSerializer(serializers.ModelSerializer):
 
 
 
-class ObjectSerializer(serializers.ModelSerializer):
+class PriorityHistorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    object_id = serializers.IntegerField(source="obj_id", read_only=True)
+    region_id = serializers.IntegerField(read_only=True)
+    level = serializers.CharField(source="level_name", read_only=True)
+
+    class Meta:
+        model = PriorityHistory
+        fields = ["object_id", "region_id", "date", "score", "level", "formula_version"]
+        read_only_fields = fields
+
+
+class ObjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     pdf = serializers.FileField(
         required=False,
         allow_null=True,
@@ -42,8 +109,14 @@ class ObjectSerializer(serializers.ModelSerializer):
     # Явно указываем формат для схемы Swagger/OpenAPI
     pdf.swagger_schema_fields = {"type": "string", "format": "binary"}
     pdf_url = serializers.SerializerMethodField(read_only=True)
+    # Названия справочников берутся из той же строки (select_related во viewset)
+    region_name = serializers.CharField(source="region.name", read_only=True)
+    resource_type_name = serializers.CharField(source="resource_type.name", read_only=True)
+    water_type_name = serializers.CharField(source="water_type.name", read_only=True, default=None)
     priority_score = serializers.SerializerMethodField()
     priority_level = serializers.SerializerMethodField()
+    # Сохранённая ИИ-оценка риска (без обращения к ИИ)
+    ai_risk = serializers.SerializerMethodField()
 
     class Meta:
         model = Object
@@ -62,19 +135,38 @@ class ObjectSerializer(serializers.ModelSerializer):
             "priority",  # если хочешь оставить старое поле
             "created_at",
             "pdf_url",
+            "region_name",
+            "resource_type_name",
+            "water_type_name",
             "priority_score",
             "priority_level",
+            "ai_risk",
         ]
+        # priority пишет только пересчёт (Object.save не сохраняет его) — значение из запроса не принимается
+        read_only_fields = ["priority"]
 
     def get_priority_score(self, obj) -> int | None:
-        if hasattr(obj, "priority_score"):
-            return obj.priority_score.score
-        return None
+        priority = self._priority(obj)
+        return priority.score if priority is not None else None
 
     def get_priority_level(self, obj) -> str | None:
-        if hasattr(obj, "priority_score"):
-            return obj.priority_score.level
-        return None
+        priority = self._priority(obj)
+        return priority.level if priority is not None else None
+
+    def get_ai_risk(self, obj) -> dict | None:
+        try:
+            entry = obj.ai_risk
+        except ObjectDoesNotExist:
+            return None
+        priority = self._priority(obj)
+        return ai_risk_representation(entry, obj, priority.score if priority is not None else obj.priority)
+
+    @staticmethod
+    def _priority(obj):
+        try:
+            return obj.priority_score
+        except ObjectDoesNotExist:
+            return None
 
     def get_pdf_url(self, obj) -> str | None:
         """
@@ -83,7 +175,76 @@ class ObjectSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         if obj.pdf:
             url = obj.pdf.url
-            if request is not None:
-                return request.build_absolute_uri(url)
-            return url
+            if request is None:
+                return url
+            if url.startswith("/"):
+                # схема и хост одни на весь ответ — считаем один раз, а не на каждую строку
+                if not hasattr(self, "_absolute_root"):
+                    self._absolute_root = request.build_absolute_uri("/")[:-1]
+                return self._absolute_root + url
+            return request.build_absolute_uri(url)
         return None
+
+
+class AIRiskAssessmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    object_id = serializers.PrimaryKeyRelatedField(source="obj", read_only=True)
+    stale = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AIRiskAssessment
+        fields = ["object_id", "risk_prob", "explanation", "model", "fingerprint", "analyzed_at", "stale"]
+        read_only_fields = fields
+
+    def get_stale(self, entry) -> bool:
+        """
+        Объект изменился после анализа или истёк TTL — нужен повторный запрос к ИИ.
+        """
+        obj = entry.obj
+        try:
+            score = obj.priority_score.score
+        except ObjectDoesNotExist:
+            score = obj.priority
+        return is_stale(entry, obj, score)
+
+
+class JobSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    rows_per_second = serializers.FloatField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "params",
+            "total",
+            "processed",
+            "progress",
+            "rows_per_second",
+            "result",
+            "error",
+            "download_url",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj) -> float | None:
+        """
+        Процент выполнения, если известно общее число строк.
+        """
+        if not obj.total:
+            return None
+        return round(min(obj.processed / obj.total, 1) * 100, 1)
+
+    def get_download_url(self, obj) -> str | None:
+        if not obj.result_file:
+            return None
+        url = reverse("job-download", kwargs={"pk": obj.pk})
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -0,0 +1,68 @@
+import calendar
+from datetime import date, timedelta
+
+from ..models import Job, JobKind, JobStatus, Object
+from .priority import passport_month_day
+from .recalc import recalculate_priorities
+
+# При пропуске больше года «дни рождения» покрывают весь год — проще пересчитать всё
+FULL_RECALC_AFTER_DAYS = 366
+
+FEB_29 = 229
+
+
+def birthday_codes(day: date) -> set[int]:
+    """
+    Коды MMDD паспортов, у которых в этот день увеличивается возраст.
+    В невисокосный год паспорта от 29 февраля «стареют» 1 марта.
+    """
+    codes = {passport_month_day(day)}
+    if day.month == 3 and day.day == 1 and not calendar.isleap(day.year):
+        codes.add(FEB_29)
+    return codes
+
+
+def last_aging_date() -> date | None:
+    """
+    День последнего успешного запуска старения (по очереди задач).
+    """
+    params = (
+        Job.objects.filter(kind=JobKind.AGE_PRIORITIES, status=JobStatus.DONE)
+        .order_by("-finished_at", "-pk")
+        .values_list("params", flat=True)
+        .first()
+    )
+    if not params or not params.get("date"):
+        return None
+    return date.fromisoformat(params["date"])
+
+
+def aging_queryset(today: date, since: date | None = None):
+    """
+    Объекты, у которых в дни (since, today] был «день рождения» паспорта.
+    Без since — только сегодняшние.
+    """
+    if since is None or since >= today:
+        since = today - timedelta(days=1)
+    if (today - since).days >= FULL_RECALC_AFTER_DAYS:
+        return Object.objects.all()
+
+    codes = set()
+    day = since
+    while day < today:
+        day += timedelta(days=1)
+        codes |= birthday_codes(day)
+    return Object.objects.filter(passport_md__in=sorted(codes))
+
+
+def age_priorities(today: date | None = None, since: date | None = None, progress=None):
+    """
+    Ежедневное старение: пересчитывает приоритет только тем объектам, у которых
+    с прошлого запуска сменился возраст паспорта (~1/365 таблицы за день).
+    """
+    today = today or date.today()
+    queryset = aging_queryset(today, since)
+    result = recalculate_priorities(queryset, today=today, progress=progress)
+    result["date"] = today.isoformat()
+    result["since"] = since.isoformat() if since else None
+    return result
@@ -1,17 +1,79 @@
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
 import requests
 from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..caching import bump_table_version
+from ..models import AIRiskAssessment
+
+logger = logging.getLogger(__name__)
+
+AI_TIMEOUT = 30
 
-OPENROUTER_API_KEY = settings.OPENROUTER_API_KEY
-OPENROUTER_MODEL = "kwaipilot/kat-coder-pro:free"   # лёгкая и дешёвая, хватит с головой
+_session = None
+_session_lock = threading.Lock()
 
-def analyze_object_with_ai(obj, score):
+
+def get_session():
     """
-    Отправляет данные объекта в ИИ и получает вероятность риска (0–1).
+    Общая requests.Session: keep-alive пул соединений и повтор при 429/5xx.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["POST"]),
+                )
+                # пул не меньше числа потоков, чтобы соединения переиспользовались, а не открывались заново
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(settings.AI_RISK_MAX_WORKERS, 1), max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({
+                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+                    "Content-Type": "application/json",
+                })
+                _session = session
+    return _session
+
+
+def ai_model():
+    return settings.OPENROUTER_MODEL   # лёгкая и дешёвая, хватит с головой
+
+
+def object_fingerprint(obj, score, model=None):
     """
+    Хэш полей, которые попадают в промпт, и имени модели.
+    Пока он не меняется, повторный запрос к ИИ не нужен.
+    """
+    payload = json.dumps([
+        model or ai_model(),
+        obj.name,
+        str(obj.region),
+        str(obj.resource_type),
+        str(obj.water_type),
+        obj.fauna,
+        obj.technical_condition,
+        str(obj.passport_date),
+        score,
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
 
-    url = "https://openrouter.ai/api/v1/chat/completions"
 
-    prompt = f"""
+def build_prompt(obj, score):
+    return f"""
     Ты — модель оценки технического риска объекта инфраструктуры.
 
     Данные объекта:
@@ -31,27 +93,147 @@ def analyze_object_with_ai(obj, score):
     }}
     """
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
 
+def request_analysis(prompt, model=None):
+    """
+    Один запрос к ИИ через общий пул соединений. Возвращает (risk_prob, explanation).
+    """
     data = {
-        "model": OPENROUTER_MODEL,
+        "model": model or ai_model(),
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.1,
     }
 
-    response = requests.post(url, json=data, headers=headers, timeout=30)
+    response = get_session().post(settings.OPENROUTER_URL, json=data, timeout=AI_TIMEOUT)
     response.raise_for_status()
 
     raw = response.json()["choices"][0]["message"]["content"]
 
     # Пытаемся распарсить JSON от модели
-    import json
     try:
         parsed = json.loads(raw)
-        return parsed["risk_prob"], parsed["explanation"]
+        return _to_probability(parsed["risk_prob"]), parsed["explanation"]
     except Exception:
         # fallback — если модель дала текст вместо JSON
-        return None, raw
\ No newline at end of file
+        return None, raw
+
+
+def risk_ttl():
+    return timedelta(days=settings.AI_RISK_TTL_DAYS)
+
+
+def is_stale(entry, obj, score):
+    """
+    Сохранённый ответ entry больше не соответствует объекту или устарел по TTL.
+    """
+    return not entry.is_fresh(object_fingerprint(obj, score), risk_ttl())
+
+
+def get_stored_risks(object_ids):
+    """
+    Сохранённые ответы ИИ по списку объектов одним запросом: {obj_id: AIRiskAssessment}.
+    """
+    return AIRiskAssessment.objects.filter(obj_id__in=list(object_ids)).in_bulk(field_name="obj_id")
+
+
+class AIAnalysisError(Exception):
+    """
+    Запрос к ИИ не удался (сеть, HTTP-ошибка, неожиданный ответ).
+    """
+
+
+def analyze_object_with_ai(obj, score, force=False):
+    """
+    Отправляет данные объекта в ИИ и получает вероятность риска (0–1).
+    Если объект не менялся и ответ не устарел, берётся сохранённый ответ без запроса.
+    Ошибка запроса поднимается как AIAnalysisError.
+    """
+    results, errors = _analyze([(obj, score)], max_workers=1, force=force)
+    if obj.pk in errors:
+        raise AIAnalysisError(str(errors[obj.pk])) from errors[obj.pk]
+    return results[obj.pk]
+
+
+def analyze_objects(items, max_workers=None, force=False):
+    """
+    Анализ пачки объектов: items — список (obj, score).
+    Актуальные ответы берутся из AIRiskAssessment, остальные запрашиваются параллельно
+    (не больше max_workers одновременно) и сохраняются. Возвращает {obj.pk: (risk_prob, explanation)};
+    объекты, по которым запрос не удался, в результат не попадают (ошибки пишутся в лог).
+    """
+    return _analyze(items, max_workers, force)[0]
+
+
+def _analyze(items, max_workers=None, force=False):
+    """
+    Общая часть analyze_objects / analyze_object_with_ai: ({obj.pk: результат}, {obj.pk: исключение}).
+    """
+    items = list(items)
+    max_workers = max_workers or settings.AI_RISK_MAX_WORKERS
+    model = ai_model()
+    fingerprints = {obj.pk: object_fingerprint(obj, score, model) for obj, score in items}
+
+    stored = get_stored_risks(fingerprints)
+    ttl = risk_ttl()
+    now = timezone.now()
+    results = {}
+    missing = []
+    for obj, score in items:
+        entry = stored.get(obj.pk)
+        if not force and entry is not None and entry.is_fresh(fingerprints[obj.pk], ttl, now):
+            results[obj.pk] = (entry.risk_prob, entry.explanation)
+        else:
+            missing.append((obj, score))
+
+    if not missing:
+        return results, {}
+
+    # промпты собираются в основном потоке — рабочие потоки не трогают ORM
+    prompts = {obj.pk: build_prompt(obj, score) for obj, score in missing}
+    fresh = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as pool:
+        futures = {pool.submit(request_analysis, prompt, model): pk for pk, prompt in prompts.items()}
+        for future in as_completed(futures):
+            pk = futures[future]
+            try:
+                fresh[pk] = future.result()
+            except Exception as exc:
+                logger.exception("AI risk analysis failed for object %s", pk)
+                errors[pk] = exc
+
+    _store(fresh, fingerprints, model)
+    results.update(fresh)
+    return results, errors
+
+
+def _store(fresh, fingerprints, model):
+    """
+    Upsert ответов одним запросом (новые и устаревшие записи вместе).
+    """
+    now = timezone.now()
+    AIRiskAssessment.objects.bulk_create(
+        [
+            AIRiskAssessment(
+                obj_id=pk,
+                risk_prob=risk_prob,
+                explanation=explanation or "",
+                fingerprint=fingerprints[pk],
+                model=model,
+                analyzed_at=now,
+            )
+            for pk, (risk_prob, explanation) in fresh.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["obj"],
+        update_fields=["risk_prob", "explanation", "fingerprint", "model", "analyzed_at"],
+    )
+    if fresh:
+        bump_table_version(AIRiskAssessment)
+
+
+def _to_probability(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
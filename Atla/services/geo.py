@@ -0,0 +1,69 @@
+import math
+
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+
+# Длина одного градуса широты, км
+KM_PER_DEGREE = 111.32
+
+
+def parse_point(value):
+    """
+    "lat,lon" → (lat, lon)
+    """
+    lat, lon = (float(part) for part in value.split(","))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("coordinates out of range")
+    return lat, lon
+
+
+def parse_bbox(value):
+    """
+    "min_lon,min_lat,max_lon,max_lat" → кортеж из 4 float (порядок как в GeoJSON/Leaflet).
+    """
+    min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(","))
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("min values must not exceed max values")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def filter_bbox(queryset, min_lon, min_lat, max_lon, max_lat):
+    """
+    Прямоугольник видимой области карты. Работает по составному индексу (latitude, longitude).
+    """
+    return queryset.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lon, max_lon),
+    )
+
+
+def radius_bbox(lat, lon, radius_km):
+    """
+    Описанный прямоугольник вокруг окружности радиуса radius_km.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(radius_km / (KM_PER_DEGREE * cos_lat), 180)
+    return lon - dlon, max(lat - dlat, -90), lon + dlon, min(lat + dlat, 90)
+
+
+def annotate_distance(queryset, lat, lon):
+    """
+    Добавляет distance_sq — квадрат расстояния в «градусах широты»
+    (равнопромежуточная проекция). Чистая арифметика, поэтому работает
+    в SQLite без PostGIS; для радиусов до сотен км точности хватает.
+    """
+    cos_lat = math.cos(math.radians(lat))
+    dy = F("latitude") - Value(lat)
+    dx = (F("longitude") - Value(lon)) * Value(cos_lat)
+    return queryset.annotate(
+        distance_sq=ExpressionWrapper(dy * dy + dx * dx, output_field=FloatField())
+    )
+
+
+def filter_radius(queryset, lat, lon, radius_km):
+    """
+    Объекты в пределах radius_km от точки: сначала индексный bbox, затем точное отсечение углов.
+    """
+    queryset = filter_bbox(queryset, *radius_bbox(lat, lon, radius_km))
+    queryset = annotate_distance(queryset, lat, lon)
+    return queryset.filter(distance_sq__lte=(radius_km / KM_PER_DEGREE) ** 2)
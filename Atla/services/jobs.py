@@ -0,0 +1,245 @@
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import Job, JobKind, JobStatus, Object
+from .aging import age_priorities, aging_queryset, last_aging_date
+from .recalc import recalculate_priorities
+from .xlsx import (
+    OBJECT_XLSX_HEADERS,
+    SPOOL_MAX_SIZE,
+    import_object_rows,
+    open_objects_workbook,
+    write_objects_xlsx,
+)
+
+logger = logging.getLogger(__name__)
+
+# Как часто (в секундах) прогресс задачи сбрасывается в БД
+PROGRESS_INTERVAL = 1.0
+
+# Задачи, которые можно выполнить заново после гибели воркера (повторный импорт создал бы объекты дважды)
+RETRYABLE_KINDS = (JobKind.EXPORT_XLS, JobKind.RECALC_PRIORITIES, JobKind.AGE_PRIORITIES)
+# Сколько раз задачу можно взять в работу
+MAX_ATTEMPTS = 3
+
+# Поля, которые run_job записывает по завершении задачи
+RESULT_FIELDS = ("status", "params", "result", "result_file", "error", "processed", "total", "finished_at")
+
+
+def enqueue_job(kind, params=None, input_file=None) -> Job:
+    """
+    Ставит задачу в очередь. Выполнит её первый свободный воркер.
+    """
+    return Job.objects.create(
+        kind=kind,
+        params=params or {},
+        input_file=input_file,
+    )
+
+
+def claim_next_job() -> Job | None:
+    """
+    Забирает самую старую задачу из очереди.
+    Захват — условный UPDATE по статусу, поэтому два воркера не возьмут одну задачу.
+    """
+    while True:
+        job_id = (
+            Job.objects.filter(status=JobStatus.PENDING)
+            .order_by("created_at", "pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status=JobStatus.PENDING).update(
+            status=JobStatus.RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+def reap_stale_jobs(now=None) -> int:
+    """
+    Задачи в RUNNING без heartbeat дольше JOB_STALE_TIMEOUT (воркер умер или завис):
+    повторяемые (RETRYABLE_KINDS) возвращаются в очередь, пока не исчерпаны попытки,
+    остальные помечаются FAILED, чтобы клиент перестал ждать.
+    Возвращает число снятых задач.
+    """
+    now = now or timezone.now()
+    timeout = settings.JOB_STALE_TIMEOUT
+    cutoff = now - timedelta(seconds=timeout)
+    stale = Job.objects.filter(status=JobStatus.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    requeued = stale.filter(kind__in=RETRYABLE_KINDS, attempts__lt=MAX_ATTEMPTS).update(
+        status=JobStatus.PENDING,
+        started_at=None,
+        heartbeat_at=None,
+        processed=0,
+    )
+    failed = stale.update(
+        status=JobStatus.FAILED,
+        error=f"Worker stopped responding (no heartbeat for {timeout} s)",
+        finished_at=now,
+    )
+    if requeued or failed:
+        logger.warning("Reaped stale jobs: %s requeued, %s failed", requeued, failed)
+    return requeued + failed
+
+
+def run_job(job: Job) -> Job:
+    """
+    Выполняет задачу и сохраняет результат или ошибку.
+    Если задачу за это время сняли как зависшую, результат не записывается.
+    """
+    handler = JOB_HANDLERS[job.kind]
+    with _Heartbeat(job):
+        try:
+            job.result = handler(job, _ProgressReporter(job))
+            job.status = JobStatus.DONE
+        except Exception as exc:
+            logger.exception("Job %s failed", job.pk)
+            job.status = JobStatus.FAILED
+            job.error = str(exc)
+
+    job.finished_at = timezone.now()
+    saved = Job.objects.filter(pk=job.pk, status=JobStatus.RUNNING, attempts=job.attempts).update(
+        **{field: getattr(job, field) for field in RESULT_FIELDS}
+    )
+    if not saved:
+        logger.warning("Job %s was reaped as stale before it finished; result discarded", job.pk)
+    return job
+
+
+def run_worker(once=False, sleep=2.0):
+    """
+    Цикл воркера: забирает и выполняет задачи, пока очередь не опустеет (once)
+    или бесконечно, опрашивая очередь раз в sleep секунд.
+    """
+    while True:
+        close_old_connections()
+        reap_stale_jobs()
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return
+            time.sleep(sleep)
+            continue
+        run_job(job)
+
+
+class _Heartbeat:
+    """
+    Фоновый поток: раз в JOB_HEARTBEAT_INTERVAL отмечает, что воркер жив,
+    даже когда обработчик долго не сообщает прогресс (сохранение большого XLSX).
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"job-{job.pk}-heartbeat", daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        try:
+            while not self.stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                Job.objects.filter(pk=self.job.pk, status=JobStatus.RUNNING).update(heartbeat_at=timezone.now())
+        finally:
+            # у потока своё соединение с БД
+            connections.close_all()
+
+
+class _ProgressReporter:
+    """
+    Callback для сервисов: обновляет processed не чаще раза в PROGRESS_INTERVAL.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.last_flush = 0.0
+
+    def set_total(self, total):
+        self.job.total = total
+        Job.objects.filter(pk=self.job.pk).update(total=total)
+
+    def __call__(self, processed):
+        self.job.processed = processed
+        now = time.monotonic()
+        if now - self.last_flush >= PROGRESS_INTERVAL:
+            self.last_flush = now
+            Job.objects.filter(pk=self.job.pk).update(processed=processed)
+
+
+def _run_import(job, progress):
+    wb, ws, header = open_objects_workbook(job.input_file.open("rb"))
+    try:
+        if header != OBJECT_XLSX_HEADERS:
+            raise ValueError(f"Unexpected headers: expected {OBJECT_XLSX_HEADERS}, got {header}")
+        if ws.max_row:
+            progress.set_total(ws.max_row - 1)
+        result = import_object_rows(ws.iter_rows(min_row=2, values_only=True), progress=progress)
+    finally:
+        wb.close()
+        job.input_file.close()
+    return result
+
+
+def _run_export(job, progress):
+    queryset = Object.objects.all()
+    progress.set_total(queryset.count())
+
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        count = write_objects_xlsx(queryset, spool, progress=progress)
+        progress(count)
+        spool.seek(0)
+        job.result_file.save(f"objects_{job.pk}.xlsx", File(spool), save=False)
+
+    return {"exported": count}
+
+
+def _run_recalc(job, progress):
+    queryset = Object.objects.all()
+    if job.params.get("ids"):
+        # отложенный пересчёт отдельных объектов (PRIORITY_RECALC_MODE = "job")
+        queryset = queryset.filter(pk__in=job.params["ids"])
+    progress.set_total(queryset.count())
+    return recalculate_priorities(queryset, progress=progress)
+
+
+def _run_aging(job, progress):
+    # дата и точка отсчёта сохраняются в params: следующий запуск догонит пропущенные дни от неё
+    today = date.fromisoformat(job.params["date"]) if job.params.get("date") else date.today()
+    since = date.fromisoformat(job.params["since"]) if job.params.get("since") else last_aging_date()
+    job.params = {**job.params, "date": today.isoformat(), "since": since.isoformat() if since else None}
+
+    progress.set_total(aging_queryset(today, since).count())
+    return age_priorities(today, since, progress=progress)
+
+
+JOB_HANDLERS = {
+    JobKind.IMPORT_XLS: _run_import,
+    JobKind.EXPORT_XLS: _run_export,
+    JobKind.RECALC_PRIORITIES: _run_recalc,
+    JobKind.AGE_PRIORITIES: _run_aging,
+}
@@ -1,5 +1,16 @@
 from datetime import date
 
+from django.conf import settings
+
+
+def passport_month_day(passport_date):
+    """
+    Код «дня рождения» паспорта: MMDD (например, 0315 → 315).
+    В этот день возраст паспорта в годах, а с ним и score, увеличивается на 1.
+    """
+    return passport_date.month * 100 + passport_date.day
+
+
 def calculate_priority_score(obj, today=None):
     """
     Формула из ТЗ:
@@ -19,3 +30,85 @@ def calculate_priority_score(obj, today=None):
 
     score = (6 - tech) * 3 + age_years
     return max(score, 0)
+
+
+def calculate_priority_scores(passport_dates, conditions, today=None):
+    """
+    Та же формула, но сразу для колонок значений (без обращения к атрибутам моделей).
+    Возвращает список score в том же порядке.
+    """
+
+    if today is None:
+        today = date.today()
+
+    year = today.year
+    month_day = (today.month, today.day)
+
+    scores = []
+    for passport_date, tech in zip(passport_dates, conditions):
+        age_years = year - passport_date.year
+        if month_day < (passport_date.month, passport_date.day):
+            age_years -= 1
+        score = (6 - tech) * 3 + age_years
+        scores.append(score if score > 0 else 0)
+    return scores
+
+
+class PriorityFormula:
+    """
+    Версия формулы приоритета.
+
+    score_fn считает score сразу для колонок значений: получает {поле: список значений}
+    (поля перечислены в fields) и дату расчёта, возвращает список score в том же порядке.
+    thresholds — нижние границы уровней (high, medium); ниже medium — low.
+    """
+
+    def __init__(self, version, score_fn, fields, thresholds=(12, 6)):
+        self.version = version
+        self.score_fn = score_fn
+        self.fields = tuple(fields)
+        self.high, self.medium = thresholds
+
+    def scores(self, columns, today=None):
+        return self.score_fn(columns, today or date.today())
+
+    def level(self, score):
+        if score >= self.high:
+            return "high"
+        if score >= self.medium:
+            return "medium"
+        return "low"
+
+    def __repr__(self):
+        return f"<PriorityFormula {self.version}>"
+
+
+FORMULAS = {}
+
+
+def register_formula(version, fields, thresholds=(12, 6)):
+    """
+    Декоратор: регистрирует колоночную функцию score как версию формулы.
+    """
+    def decorator(score_fn):
+        FORMULAS[version] = PriorityFormula(version, score_fn, fields, thresholds)
+        return score_fn
+    return decorator
+
+
+def get_formula(version=None) -> PriorityFormula:
+    """
+    Формула по версии; без версии — активная (settings.PRIORITY_FORMULA_VERSION).
+    """
+    if version is None:
+        version = getattr(settings, "PRIORITY_FORMULA_VERSION", "v1")
+    try:
+        return FORMULAS[version]
+    except KeyError:
+        raise ValueError(f"Unknown priority formula version: {version}") from None
+
+
+@register_formula("v1", fields=("passport_date", "technical_condition"))
+def formula_v1(columns, today):
+    # пороги уровней по ТЗ: ≥ 12 → Высокий, 6–11 → Средний, < 6 → Низкий
+    return calculate_priority_scores(columns["passport_date"], columns["technical_condition"], today)
@@ -0,0 +1,222 @@
+import time
+from collections import Counter, defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..caching import bump_table_version
+from ..models import LEVEL_CODES, Object, PriorityHistory, PriorityScore
+from .priority import get_formula
+from .stats import StatsDelta
+from .tiles import invalidate_points
+
+# Сколько объектов пересчитывается и записывается за один проход
+RECALC_BATCH_SIZE = 1000
+
+
+def recalculate_priorities(queryset=None, today=None, batch_size=RECALC_BATCH_SIZE, progress=None):
+    """
+    Массовый пересчёт PriorityScore и Object.priority для набора объектов.
+
+    Объекты читаются пачками по первичному ключу (keyset), score считается
+    сразу для всей пачки, новые записи создаются через bulk_create, а изменённые
+    обновляются групповыми UPDATE по значению score. Неизменившиеся строки
+    не пишутся вовсе, так что на пачку уходит несколько запросов вместо ~4
+    на каждый объект.
+
+    progress — необязательный callback, получает число обработанных строк после каждой пачки.
+    """
+
+    if queryset is None:
+        queryset = Object.objects.all()
+    if today is None:
+        today = date.today()
+
+    formula = get_formula()
+    started = time.perf_counter()
+    processed = created = updated = 0
+
+    fields = ("priority", "priority_level", "latitude", "longitude", "region_id", *formula.fields)
+    for rows in iter_batches(queryset, fields, batch_size):
+        batch_created, batch_updated = _recalculate_batch(rows, formula, today)
+        processed += len(rows)
+        created += batch_created
+        updated += batch_updated
+        if progress is not None:
+            progress(processed)
+
+    seconds = time.perf_counter() - started
+    return {
+        "processed": processed,
+        "created": created,
+        "updated": updated,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(processed / seconds) if seconds else processed,
+    }
+
+
+def iter_batches(queryset, fields, batch_size=RECALC_BATCH_SIZE):
+    """
+    Строки queryset пачками по первичному ключу (keyset): кортежи (pk, *fields).
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).values_list("pk", *fields)[:batch_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield rows
+        if len(rows) < batch_size:
+            return
+
+
+def formula_columns(rows, formula, offset):
+    """
+    Колонки для формулы из строк values_list: поля формулы начинаются с позиции offset.
+    """
+    return {field: [row[offset + i] for row in rows] for i, field in enumerate(formula.fields)}
+
+
+def _recalculate_batch(rows, formula, today):
+    ids = [row[0] for row in rows]
+    scores = formula.scores(formula_columns(rows, formula, offset=6), today)
+
+    existing = {
+        priority.obj_id: priority
+        for priority in PriorityScore.objects.filter(obj_id__in=ids).only(
+            "id", "obj_id", "score", "level", "formula_version"
+        )
+    }
+    formula_version = formula.version
+    now = timezone.now()
+
+    to_create = []
+    stats = StatsDelta()
+    # Обновления группируются по значению score: один UPDATE ... WHERE id IN (...)
+    # на каждое различное значение вместо CASE WHEN на каждую строку
+    scores_to_update = defaultdict(list)
+    priorities_to_update = defaultdict(list)
+    # точка истории пишется только при изменении, а не на каждый пересчёт
+    history = []
+
+    for (obj_id, old_priority, old_level_code, _lat, _lon, region_id, *_fields), score in zip(rows, scores):
+        level = formula.level(score)
+        priority = existing.get(obj_id)
+        changed = True
+        if priority is None:
+            to_create.append(PriorityScore(
+                obj_id=obj_id,
+                score=score,
+                level=level,
+                formula_version=formula_version,
+            ))
+            stats.move_level(None, level)
+        elif (priority.score, priority.formula_version) != (score, formula_version):
+            scores_to_update[score].append(priority.pk)
+            stats.move_level(priority.level, level)
+        else:
+            changed = False
+
+        if changed:
+            history.append(PriorityHistory(
+                obj_id=obj_id,
+                region_id=region_id,
+                date=today,
+                score=score,
+                level=PriorityHistory.LEVEL_CODES[level],
+                formula_version=formula_version,
+            ))
+
+        # score и код уровня на самом объекте (уровень — функция score, группировка та же)
+        if (old_priority, old_level_code) != (score, LEVEL_CODES[level]):
+            priorities_to_update[score].append(obj_id)
+
+    if not (to_create or scores_to_update or priorities_to_update):
+        # пачка без изменений — только два чтения, без транзакции
+        return 0, 0
+
+    with transaction.atomic():
+        if to_create:
+            PriorityScore.objects.bulk_create(to_create)
+        for score, pks in scores_to_update.items():
+            PriorityScore.objects.filter(pk__in=pks).update(
+                score=score,
+                level=formula.level(score),
+                formula_version=formula_version,
+                updated_at=now,
+            )
+        for score, obj_ids in priorities_to_update.items():
+            Object.objects.filter(pk__in=obj_ids).update(priority=score, priority_level=LEVEL_CODES[formula.level(score)])
+        if history:
+            # повторное изменение в тот же день перезаписывает точку дня
+            PriorityHistory.objects.bulk_create(
+                history,
+                update_conflicts=True,
+                unique_fields=["obj", "date"],
+                update_fields=["region", "score", "level", "formula_version"],
+            )
+        stats.flush()
+        if to_create or scores_to_update:
+            bump_table_version(PriorityScore)
+        if priorities_to_update:
+            bump_table_version(Object)
+            # максимальный приоритет в кластерах карты мог измениться
+            changed_ids = {obj_id for obj_ids in priorities_to_update.values() for obj_id in obj_ids}
+            invalidate_points([
+                (lat, lon) for obj_id, _priority, _level, lat, lon, *_fields in rows
+                if obj_id in changed_ids
+            ])
+
+    updated = sum(len(pks) for pks in scores_to_update.values())
+    return len(to_create), updated
+
+
+def shadow_evaluate(version, queryset=None, today=None, batch_size=RECALC_BATCH_SIZE):
+    """
+    Теневая оценка формулы: считает score версии version по всей выборке за один проход
+    и сравнивает с сохранёнными PriorityScore, ничего не записывая.
+    Возвращает распределения уровней, матрицу переходов и средние score.
+    """
+    candidate = get_formula(version)
+    if queryset is None:
+        queryset = Object.objects.all()
+    if today is None:
+        today = date.today()
+
+    started = time.perf_counter()
+    processed = changed = 0
+    current_sum = candidate_sum = 0
+    current_levels = Counter()
+    candidate_levels = Counter()
+    transitions = Counter()
+
+    fields = ("priority_score__score", "priority_score__level", *candidate.fields)
+    for rows in iter_batches(queryset, fields, batch_size):
+        scores = candidate.scores(formula_columns(rows, candidate, offset=3), today)
+        for (_pk, old_score, old_level, *_fields), score in zip(rows, scores):
+            level = candidate.level(score)
+            current_levels[old_level] += 1
+            candidate_levels[level] += 1
+            if old_level != level:
+                transitions[f"{old_level}->{level}"] += 1
+            if old_score != score:
+                changed += 1
+            current_sum += old_score or 0
+            candidate_sum += score
+        processed += len(rows)
+
+    seconds = time.perf_counter() - started
+    return {
+        "version": candidate.version,
+        "processed": processed,
+        "changed_scores": changed,
+        "current_levels": dict(current_levels),
+        "candidate_levels": dict(candidate_levels),
+        "level_transitions": dict(transitions),
+        "current_avg_score": round(current_sum / processed, 3) if processed else None,
+        "candidate_avg_score": round(candidate_sum / processed, 3) if processed else None,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(processed / seconds) if seconds else processed,
+    }
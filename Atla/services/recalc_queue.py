@@ -0,0 +1,82 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import JobKind, Object
+from .jobs import enqueue_job
+from .recalc import recalculate_priorities
+
+# Поля, от которых зависит приоритет: правка остальных полей пересчёт не запускает
+PRIORITY_FIELDS = ("technical_condition", "passport_date")
+
+_state = threading.local()
+
+
+def _pending() -> set:
+    if not hasattr(_state, "pending"):
+        _state.pending = set()
+        _state.depth = 0
+    return _state.pending
+
+
+def needs_recalc(instance: Object, created: bool, update_fields=None) -> bool:
+    """
+    Нужно ли пересчитывать приоритет после сохранения объекта.
+    """
+    if created:
+        return True
+    if update_fields is not None and not set(update_fields) & set(PRIORITY_FIELDS):
+        return False
+    loaded = getattr(instance, "_loaded_values", None)
+    if not loaded or any(field not in loaded for field in PRIORITY_FIELDS):
+        # исходные значения неизвестны — пересчитываем на всякий случай
+        return True
+    return any(loaded[field] != getattr(instance, field) for field in PRIORITY_FIELDS)
+
+
+def mark_dirty(pk):
+    """
+    Отмечает объект для пересчёта. Все отмеченные за транзакцию объекты
+    пересчитываются одним пакетом после коммита (вне транзакции — сразу).
+    Внутри deferred_recalc() пересчёт откладывается до выхода из блока.
+    """
+    pending = _pending()
+    pending.add(pk)
+    if _state.depth == 0:
+        # колбэк на каждое сохранение дешёвый: первый заберёт весь набор, остальные найдут его пустым
+        transaction.on_commit(flush)
+
+
+@contextmanager
+def deferred_recalc():
+    """
+    Копит отмеченные объекты на время блока и пересчитывает их одним пакетом в конце
+    (или после коммита, если блок выполняется внутри транзакции).
+    """
+    _pending()
+    _state.depth += 1
+    try:
+        yield
+    finally:
+        _state.depth -= 1
+        if _state.depth == 0 and _state.pending:
+            transaction.on_commit(flush)
+
+
+def flush():
+    """
+    Пересчитывает накопленные объекты. В режиме PRIORITY_RECALC_MODE = "job"
+    пересчёт уходит в очередь фоновых задач (выполнит `manage.py run_jobs`).
+    """
+    pending = _pending()
+    if not pending or _state.depth:
+        return
+    ids = sorted(pending)
+    pending.clear()
+
+    if settings.PRIORITY_RECALC_MODE == "job":
+        enqueue_job(JobKind.RECALC_PRIORITIES, {"ids": ids})
+        return
+    recalculate_priorities(Object.objects.filter(pk__in=ids))
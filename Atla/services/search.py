@@ -0,0 +1,228 @@
+import math
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+
+from ..models import Object, ObjectNameTrigram
+
+# Полнотекстовый индекс названий (SQLite FTS5), синхронизируется триггерами на Atla_object
+FTS_TABLE = "atla_object_fts"
+
+# Доля триграмм запроса, которая должна совпасть, чтобы объект считался найденным с опечаткой
+TRIGRAM_MIN_SIMILARITY = 0.4
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """
+    Нормализация для поиска: регистр (включая кириллицу и казахские буквы), ё → е.
+    """
+    return (text or "").casefold().replace("ё", "е")
+
+
+def words(text: str) -> list[str]:
+    return _WORD_RE.findall(normalize(text))
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Триграммы слов как в pg_trgm: слово дополняется двумя пробелами слева и одним справа.
+    """
+    result = set()
+    for word in words(text):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+_fts_tables = {}
+
+
+def fts_available() -> bool:
+    """
+    Есть ли FTS5-таблица в текущей БД (создаётся миграцией только на SQLite).
+    """
+    if connection.vendor != "sqlite":
+        return False
+    key = str(connection.settings_dict["NAME"])
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_tables[key] = cursor.fetchone() is not None
+    return _fts_tables[key]
+
+
+def search_objects(queryset, query: str):
+    """
+    queryset, отфильтрованный поиском по названию, с аннотацией search_rank (меньше — лучше).
+    Совпадения отбираются подзапросом к индексу в том же SQL, без выгрузки id в Python:
+    выдача и COUNT страниц — по всем найденным объектам, а не по первым N.
+    Порядок выбора индекса тот же, что в search_object_ids.
+    """
+    terms = words(query)
+    if not terms:
+        return queryset.none()
+
+    if fts_available():
+        match = _fts_match(terms)
+        if _fts_exists(match):
+            return _fts_filter(queryset, match)
+    return _trigram_filter(queryset, query)
+
+
+def search_object_ids(query: str, limit: int = 10, ranked: bool = True) -> list[int]:
+    """
+    Id объектов по названию, лучшие первыми.
+    Сначала полнотекстовый поиск по префиксам слов (поиск по мере ввода),
+    если он ничего не нашёл (опечатка) или FTS5 нет — нечёткий по триграммам.
+
+    ranked=False — для подсказок: вместо bm25 (считается для каждого совпадения)
+    сначала названия, которые начинаются с запроса, затем остальные.
+    """
+    terms = words(query)
+    if not terms:
+        return []
+
+    if fts_available():
+        ids = _fts_search(terms, limit) if ranked else _fts_prefix_search(terms, limit)
+        if ids:
+            return ids
+    return _trigram_search(query, limit)
+
+
+def autocomplete(query: str, limit: int = 10) -> list[dict]:
+    """
+    Подсказки для строки поиска: [{"id", "name"}] в порядке релевантности.
+    """
+    ids = search_object_ids(query, limit, ranked=False)
+    names = dict(Object.objects.filter(pk__in=ids).values_list("pk", "name"))
+    return [{"id": pk, "name": names[pk]} for pk in ids if pk in names]
+
+
+def index_object_names(objects):
+    """
+    Обновляет триграммы для пар (id, name). FTS-индекс обновляется триггерами БД сам.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+    rows = [
+        ObjectNameTrigram(obj_id=pk, trigram=trigram)
+        for pk, name in objects
+        for trigram in trigrams(name)
+    ]
+    with transaction.atomic():
+        ObjectNameTrigram.objects.filter(obj_id__in=[pk for pk, _name in objects]).delete()
+        ObjectNameTrigram.objects.bulk_create(rows, batch_size=2000)
+
+
+def rebuild_search_index(batch_size=2000):
+    """
+    Полная пересборка индексов поиска (FTS и триграммы).
+    """
+    with transaction.atomic():
+        ObjectNameTrigram.objects.all().delete()
+        if fts_available():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+                # тот же текст, что пишут триггеры миграции 0011
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}(rowid, name) "
+                    f"SELECT id, replace(replace(name, 'ё', 'е'), 'Ё', 'Е') FROM {Object._meta.db_table}"
+                )
+
+        last_pk = 0
+        while True:
+            batch = list(
+                Object.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "name")[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            ObjectNameTrigram.objects.bulk_create(
+                [ObjectNameTrigram(obj_id=pk, trigram=trigram) for pk, name in batch for trigram in trigrams(name)],
+                batch_size=batch_size,
+            )
+
+
+def _fts_match(terms):
+    # каждое слово — префикс: «балх вод» найдёт «Балхаш, водохранилище»
+    return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _fts_exists(match):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT 1", [match])
+        return cursor.fetchone() is not None
+
+
+def _fts_filter(queryset, match):
+    # bm25 считается коррелированным подзапросом только для строк, прошедших IN (...)
+    outer_pk = "{}.{}".format(
+        connection.ops.quote_name(queryset.model._meta.db_table),
+        connection.ops.quote_name(queryset.model._meta.pk.column),
+    )
+    return queryset.filter(
+        pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]),
+    ).annotate(
+        search_rank=RawSQL(
+            f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {outer_pk}",
+            [match],
+        ),
+    )
+
+
+def _trigram_filter(queryset, query):
+    grams = trigrams(query)
+    if not grams:
+        return queryset.none()
+    min_shared = max(1, math.ceil(len(grams) * TRIGRAM_MIN_SIMILARITY))
+    matches = ObjectNameTrigram.objects.filter(trigram__in=grams).values("obj_id").annotate(shared=Count("trigram"))
+    shared = matches.filter(obj_id=OuterRef("pk")).values("shared")
+    # больше общих триграмм — выше, поэтому ранг отрицательный
+    return queryset.filter(
+        pk__in=matches.filter(shared__gte=min_shared).values("obj_id"),
+    ).annotate(search_rank=-Subquery(shared, output_field=IntegerField()))
+
+
+def _fts_search(terms, limit):
+    match = _fts_match(terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}) LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fts_prefix_search(terms, limit):
+    ids = []
+    with connection.cursor() as cursor:
+        # ^ — совпадение с начала названия
+        for match in ("^" + _fts_match(terms), _fts_match(terms)):
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s",
+                [match, limit],
+            )
+            ids += [row[0] for row in cursor.fetchall() if row[0] not in ids]
+            if len(ids) >= limit:
+                break
+    return ids[:limit]
+
+
+def _trigram_search(query, limit):
+    grams = trigrams(query)
+    if not grams:
+        return []
+    min_shared = max(1, math.ceil(len(grams) * TRIGRAM_MIN_SIMILARITY))
+    return list(
+        ObjectNameTrigram.objects.filter(trigram__in=grams)
+        .values("obj_id")
+        .annotate(shared=Count("trigram"))
+        .filter(shared__gte=min_shared)
+        .order_by("-shared", "obj_id")
+        .values_list("obj_id", flat=True)[:limit]
+    )
@@ -0,0 +1,118 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from ..models import Object, ObjectStatistic, PriorityLevel, PriorityScore, StatDimension
+
+
+class StatsDelta:
+    """
+    Накопитель изменений сводки дашборда. Изменения по одному ключу
+    складываются, а flush() пишет по одному UPDATE на изменённый ключ.
+    """
+
+    def __init__(self):
+        self.changes = defaultdict(lambda: [0, 0])
+
+    def add_object(self, region_id, resource_type_id, technical_condition, sign=1):
+        condition = (technical_condition or 0) * sign
+        for key in (
+            (StatDimension.TOTAL, ""),
+            (StatDimension.REGION, str(region_id)),
+            (StatDimension.RESOURCE_TYPE, str(resource_type_id)),
+        ):
+            self.changes[key][0] += sign
+            self.changes[key][1] += condition
+
+    def remove_object(self, region_id, resource_type_id, technical_condition):
+        self.add_object(region_id, resource_type_id, technical_condition, sign=-1)
+
+    def move_level(self, old_level, new_level):
+        if old_level == new_level:
+            return
+        if old_level:
+            self.changes[(StatDimension.LEVEL, str(old_level))][0] -= 1
+        if new_level:
+            self.changes[(StatDimension.LEVEL, str(new_level))][0] += 1
+
+    def flush(self):
+        for (dimension, key), (count, condition_sum) in self.changes.items():
+            if count or condition_sum:
+                _apply(dimension, key, count, condition_sum)
+        self.changes.clear()
+
+
+def _apply(dimension, key, count, condition_sum):
+    rows = ObjectStatistic.objects.filter(dimension=dimension, key=key)
+    if rows.update(count=F("count") + count, condition_sum=F("condition_sum") + condition_sum):
+        return
+    try:
+        with transaction.atomic():
+            ObjectStatistic.objects.create(
+                dimension=dimension, key=key, count=count, condition_sum=condition_sum,
+            )
+    except IntegrityError:
+        # строку успел создать параллельный запрос
+        rows.update(count=F("count") + count, condition_sum=F("condition_sum") + condition_sum)
+
+
+def rebuild_statistics():
+    """
+    Полная пересборка сводки агрегирующими запросами (для починки).
+    """
+    rows = [
+        ObjectStatistic(dimension=StatDimension.TOTAL, key="", **_aggregate(Object.objects.all()))
+    ]
+    for field, dimension in (("region_id", StatDimension.REGION), ("resource_type_id", StatDimension.RESOURCE_TYPE)):
+        for row in Object.objects.order_by().values(field).annotate(
+            count=Count("pk"), condition_sum=Sum("technical_condition"),
+        ):
+            rows.append(ObjectStatistic(
+                dimension=dimension,
+                key=str(row[field]),
+                count=row["count"],
+                condition_sum=row["condition_sum"] or 0,
+            ))
+    for row in PriorityScore.objects.order_by().values("level").annotate(count=Count("pk")):
+        rows.append(ObjectStatistic(dimension=StatDimension.LEVEL, key=row["level"], count=row["count"]))
+
+    with transaction.atomic():
+        ObjectStatistic.objects.all().delete()
+        ObjectStatistic.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _aggregate(queryset):
+    totals = queryset.aggregate(count=Count("pk"), condition_sum=Sum("technical_condition"))
+    return {"count": totals["count"], "condition_sum": totals["condition_sum"] or 0}
+
+
+def dashboard_statistics():
+    """
+    Данные дашборда одним запросом к сводной таблице.
+    """
+    result = {
+        "total": 0,
+        "avg_technical_condition": None,
+        "by_region": [],
+        "by_resource_type": [],
+        "by_level": {level: 0 for level in PriorityLevel.values},
+    }
+    for stat in ObjectStatistic.objects.filter(count__gt=0):
+        average = round(stat.condition_sum / stat.count, 2)
+        if stat.dimension == StatDimension.TOTAL:
+            result["total"] = stat.count
+            result["avg_technical_condition"] = average
+        elif stat.dimension == StatDimension.LEVEL:
+            result["by_level"][stat.key] = stat.count
+        else:
+            result[f"by_{stat.dimension}"].append({
+                f"{stat.dimension}_id": int(stat.key),
+                "count": stat.count,
+                "avg_technical_condition": average,
+            })
+
+    result["by_region"].sort(key=lambda row: row["region_id"])
+    result["by_resource_type"].sort(key=lambda row: row["resource_type_id"])
+    return result
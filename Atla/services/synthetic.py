@@ -0,0 +1,109 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from ..caching import bump_table_version
+from ..models import Object, Region, ResourceType, WaterType
+from .priority import passport_month_day
+from .recalc import recalculate_priorities
+from .search import index_object_names
+from .stats import rebuild_statistics
+from .tiles import invalidate_all
+
+# Размеры наборов для бенчмарков
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+REGIONS = (
+    "Абайская", "Акмолинская", "Актюбинская", "Алматинская", "Атырауская",
+    "Восточно-Казахстанская", "Жамбылская", "Жетысуская", "Западно-Казахстанская",
+    "Карагандинская", "Костанайская", "Кызылординская", "Мангистауская",
+    "Павлодарская", "Северо-Казахстанская", "Туркестанская", "Улытауская",
+)
+RESOURCE_TYPES = ("Озеро", "Водохранилище", "Канал", "Гидроузел", "Плотина", "Шлюз")
+WATER_TYPES = ("Пресная", "Солоноватая", "Солёная")
+
+NAME_STEMS = (
+    "Балхаш", "Алаколь", "Зайсан", "Капшагай", "Бухтарма", "Шардара", "Сорбулак",
+    "Тенгиз", "Маркаколь", "Боровое", "Щучье", "Сасыкколь", "Иртыш", "Ишим", "Тобол",
+    "Сырдарья", "Или", "Чу", "Талас", "Урал", "Нура", "Эмба", "Каратал", "Аксу",
+)
+
+# Территория Казахстана (примерно)
+LAT_RANGE = (40.5, 55.4)
+LON_RANGE = (46.5, 87.3)
+
+PASSPORT_START = date(1960, 1, 1)
+PASSPORT_DAYS = 23_000
+
+
+def parse_scale(value: str) -> int:
+    """
+    "10k" / "100k" / "1m" или число объектов.
+    """
+    value = str(value).lower()
+    if value in SCALES:
+        return SCALES[value]
+    count = int(value)
+    if count <= 0:
+        raise ValueError("scale must be positive")
+    return count
+
+
+def generate_dataset(count: int, seed: int = 0, batch_size: int = 5000, progress=None) -> dict:
+    """
+    Детерминированный синтетический набор: справочники и count объектов.
+    Одинаковые count и seed дают одинаковые строки (кроме id и created_at).
+    Объекты пишутся через bulk_create пачками, затем одним проходом
+    пересчитываются приоритеты, индекс поиска и сводка дашборда.
+    """
+    rng = random.Random(seed)
+    regions = _references(Region, REGIONS)
+    resource_types = _references(ResourceType, RESOURCE_TYPES)
+    water_types = _references(WaterType, WATER_TYPES) + [None]
+
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        objects = [_object(rng, created + i, regions, resource_types, water_types) for i in range(size)]
+        with transaction.atomic():
+            Object.objects.bulk_create(objects)
+            index_object_names((obj.pk, obj.name) for obj in objects)
+        created += size
+        if progress is not None:
+            progress(created)
+
+    # bulk_create обходит сигналы — производные данные считаются пакетно
+    recalculate_priorities()
+    rebuild_statistics()
+    bump_table_version(Object)
+    invalidate_all()
+    return {
+        "objects": created,
+        "regions": len(regions),
+        "resource_types": len(resource_types),
+        "water_types": len(water_types) - 1,
+    }
+
+
+def _references(model, names):
+    existing = {name: pk for pk, name in model.objects.values_list("pk", "name")}
+    model.objects.bulk_create([model(name=name) for name in names if name not in existing])
+    return list(model.objects.filter(name__in=names).order_by("pk").values_list("pk", flat=True))
+
+
+def _object(rng, index, regions, resource_types, water_types):
+    passport_date = PASSPORT_START + timedelta(days=rng.randrange(PASSPORT_DAYS))
+    return Object(
+        name=f"{rng.choice(NAME_STEMS)} {rng.choice(RESOURCE_TYPES).lower()} №{index + 1}",
+        region_id=rng.choice(regions),
+        resource_type_id=rng.choice(resource_types),
+        water_type_id=rng.choice(water_types),
+        fauna=rng.random() < 0.7,
+        passport_date=passport_date,
+        passport_md=passport_month_day(passport_date),
+        technical_condition=rng.randint(1, 5),
+        latitude=Decimal(f"{rng.uniform(*LAT_RANGE):.6f}"),
+        longitude=Decimal(f"{rng.uniform(*LON_RANGE):.6f}"),
+    )
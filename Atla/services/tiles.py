@@ -0,0 +1,172 @@
+import hashlib
+import math
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, FloatField, Max, Value
+from django.db.models.functions import Cast, Floor, Greatest, Least
+
+from GidroAtlas.db_router import primary_reads_since
+
+from ..models import PriorityScore
+
+# До этого зума агрегаты кэшируются и инвалидируются по тайлам
+MAX_TILE_ZOOM = 18
+
+# Тайл делится на GRID x GRID ячеек, каждая непустая ячейка — один кластер
+CLUSTER_GRID = 8
+
+# Ограничивает «жизнь» агрегата, даже если инвалидация где-то не сработала
+TILE_CACHE_TIMEOUT = 600
+
+# При массовых изменениях дешевле сменить поколение всех тайлов, чем обходить каждый
+BULK_INVALIDATE_THRESHOLD = 50
+
+_GENERATION_KEY = "atla:tiles:generation"
+
+
+def tile_bounds(z, x, y):
+    """
+    Границы XYZ-тайла (Web Mercator) в градусах: (west, south, east, north).
+    """
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def point_tile(lat, lon, z):
+    """
+    XYZ-тайл, в который попадает точка на зуме z, по тем же полуоткрытым границам,
+    что и выборка тайла: [west, east) по долготе, (south, north] по широте.
+    """
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = min(max(int((lon + 180.0) / 360.0 * n), 0), n - 1)
+    y = min(max(int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n), 0), n - 1)
+    # формула и tile_bounds округляются по-разному — на самой границе верим tile_bounds
+    west, south, east, north = tile_bounds(z, x, y)
+    if lon >= east and x < n - 1:
+        x += 1
+    elif lon < west and x > 0:
+        x -= 1
+    if lat <= south and y < n - 1:
+        y += 1
+    elif lat > north and y > 0:
+        y -= 1
+    return x, y
+
+
+def get_tile_clusters(queryset, z, x, y, params=""):
+    """
+    Кластеры объектов тайла: count, центроид и максимальный приоритет по ячейкам сетки.
+    Результат кэшируется; params — строка фильтров, которые применены к queryset.
+    """
+    if z > MAX_TILE_ZOOM:
+        return _aggregate_tile(queryset, z, x, y)
+
+    key, last_modified = _tile_data_key(z, x, y, params)
+    clusters = cache.get(key)
+    if clusters is None:
+        with primary_reads_since(last_modified):
+            clusters = _aggregate_tile(queryset, z, x, y)
+        cache.set(key, clusters, TILE_CACHE_TIMEOUT)
+    return clusters
+
+
+def invalidate_points(points):
+    """
+    Сбрасывает кэш тайлов, в которые попадают точки (lat, lon), на всех зумах.
+    Остальные тайлы остаются в кэше. Сброс — после коммита текущей транзакции,
+    как и bump_table_version: иначе тайл успели бы пересобрать из старых данных.
+    """
+    points = [(float(lat), float(lon)) for lat, lon in points if lat is not None and lon is not None]
+    if not points:
+        return
+    if len(points) > BULK_INVALIDATE_THRESHOLD:
+        invalidate_all()
+        return
+
+    def bump():
+        stamp = int(time.time())
+        versions = {}
+        for lat, lon in points:
+            for z in range(MAX_TILE_ZOOM + 1):
+                x, y = point_tile(lat, lon, z)
+                versions[_tile_version_key(z, x, y)] = (uuid.uuid4().hex[:12], stamp)
+        cache.set_many(versions, None)
+
+    transaction.on_commit(bump)
+
+
+def invalidate_all():
+    transaction.on_commit(lambda: cache.set(_GENERATION_KEY, (uuid.uuid4().hex[:12], int(time.time())), None))
+
+
+def _aggregate_tile(queryset, z, x, y):
+    west, south, east, north = tile_bounds(z, x, y)
+    cell_w = (east - west) / CLUSTER_GRID
+    cell_h = (north - south) / CLUSTER_GRID
+
+    lat = Cast("latitude", FloatField())
+    lon = Cast("longitude", FloatField())
+    last_cell = Value(float(CLUSTER_GRID - 1))
+    rows = (
+        # полуоткрытые границы: точка на общей границе попадает ровно в один тайл (как в point_tile)
+        queryset.filter(
+            longitude__gte=west,
+            longitude__lt=east,
+            latitude__gt=south,
+            latitude__lte=north,
+        )
+        .order_by()
+        .annotate(
+            # округление у самой границы не должно давать девятую ячейку
+            cell_x=Least(Greatest(Floor((lon - west) / cell_w), Value(0.0)), last_cell),
+            cell_y=Least(Greatest(Floor((north - lat) / cell_h), Value(0.0)), last_cell),
+        )
+        .values("cell_x", "cell_y")
+        .annotate(
+            count=Count("pk"),
+            lat=Avg(lat),
+            lon=Avg(lon),
+            max_score=Max("priority"),
+        )
+    )
+
+    return [
+        {
+            "count": row["count"],
+            "lat": round(row["lat"], 6),
+            "lon": round(row["lon"], 6),
+            "max_score": row["max_score"],
+            "max_level": PriorityScore._detect_level(row["max_score"] or 0),
+        }
+        for row in rows
+    ]
+
+
+def _tile_version_key(z, x, y):
+    return f"atla:tiles:version:{z}:{x}:{y}"
+
+
+def _tile_data_key(z, x, y, params):
+    """
+    (ключ агрегата, unix time последнего сброса тайла). Ключ включает поколение
+    и версию тайла; пропавшая версия (очистка кэша, cull FileBasedCache) заменяется
+    новой случайной, а не значением по умолчанию — выпавший ключ даёт промах, а не старый агрегат.
+    """
+    version_key = _tile_version_key(z, x, y)
+    stored = cache.get_many([_GENERATION_KEY, version_key])
+    missing = {key: (uuid.uuid4().hex[:12], int(time.time())) for key in (_GENERATION_KEY, version_key) if key not in stored}
+    for key, version in missing.items():
+        cache.add(key, version, None)
+    if missing:
+        stored = {**missing, **cache.get_many(list(missing)), **stored}
+    (generation, generation_at), (version, version_at) = stored[_GENERATION_KEY], stored[version_key]
+    params_hash = hashlib.md5(params.encode()).hexdigest()[:12]
+    return f"atla:tiles:data:{generation}:{z}:{x}:{y}:{version}:{params_hash}", max(generation_at, version_at)
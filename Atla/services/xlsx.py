@@ -0,0 +1,330 @@
+from itertools import islice
+from tempfile import SpooledTemporaryFile
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.http import FileResponse
+from openpyxl import Workbook, load_workbook
+
+from GidroAtlas.middleware import timed
+
+from ..caching import bump_table_version
+from ..models import LEVEL_CODES, Object, Region, ResourceType, WaterType
+from .priority import get_formula, passport_month_day
+from .recalc import recalculate_priorities
+from .search import index_object_names
+from .stats import StatsDelta
+from .tiles import invalidate_points
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Колонки выгрузки/загрузки объектов (порядок важен для импорта)
+OBJECT_XLSX_HEADERS = [
+    "id",
+    "name",
+    "region_id",
+    "resource_type_id",
+    "water_type_id",
+    "fauna",
+    "passport_date",
+    "technical_condition",
+    "latitude",
+    "longitude",
+    "pdf",
+    "priority",
+    "created_at",
+]
+
+# Сколько строк забирается из БД за один fetch серверного курсора
+EXPORT_CHUNK_SIZE = 2000
+
+# Сколько строк импорта валидируется и записывается в одной транзакции
+IMPORT_CHUNK_SIZE = 1000
+
+# До этого размера файл держится в памяти, дальше уходит на диск
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def iter_object_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Строки для XLSX прямо из values_list() через iterator(),
+    без создания экземпляров моделей и без загрузки всей выборки в память.
+    """
+    rows = queryset.order_by("pk").values_list(*OBJECT_XLSX_HEADERS).iterator(chunk_size=chunk_size)
+    for (
+        obj_id,
+        name,
+        region_id,
+        resource_type_id,
+        water_type_id,
+        fauna,
+        passport_date,
+        technical_condition,
+        latitude,
+        longitude,
+        pdf,
+        priority,
+        created_at,
+    ) in rows:
+        yield [
+            obj_id,
+            name,
+            region_id,
+            resource_type_id,
+            water_type_id,
+            fauna,
+            passport_date.isoformat() if passport_date else None,
+            technical_condition,
+            float(latitude) if latitude is not None else None,
+            float(longitude) if longitude is not None else None,
+            pdf or "",
+            priority,
+            created_at.isoformat() if created_at else None,
+        ]
+
+
+def write_objects_xlsx(queryset, fileobj, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """
+    Записывает объекты в fileobj через write-only режим openpyxl:
+    строки сразу сбрасываются во временный файл листа, а не копятся в памяти.
+    Возвращает количество выгруженных строк.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Objects")
+    ws.append(OBJECT_XLSX_HEADERS)
+
+    count = 0
+    for row in iter_object_rows(queryset, chunk_size=chunk_size):
+        ws.append(row)
+        count += 1
+        if progress is not None and count % chunk_size == 0:
+            progress(count)
+
+    wb.save(fileobj)
+    return count
+
+
+def export_objects_response(queryset, filename="objects.xlsx"):
+    """
+    Готовит XLSX во временном (spooled) файле и отдаёт его потоково через FileResponse.
+    """
+    spool = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with timed("xlsx"):
+        write_objects_xlsx(queryset, spool)
+    spool.seek(0)
+
+    return FileResponse(
+        spool,
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def open_objects_workbook(upload):
+    """
+    Открывает XLSX в read-only режиме (строки читаются потоково).
+    Возвращает (workbook, worksheet, header).
+    """
+    wb = load_workbook(upload, read_only=True, data_only=True)
+    ws = wb.active
+    header = list(next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()))
+    return wb, ws, header
+
+
+def import_object_rows(rows, chunk_size=IMPORT_CHUNK_SIZE, start=2, progress=None):
+    """
+    Импорт строк XLSX (values_only) пачками.
+
+    Справочники загружаются один раз в словари, каждая пачка валидируется
+    целиком, затем записывается через bulk_create/bulk_update в своей транзакции.
+    Приоритеты пересчитываются сразу для всей пачки, а не сигналом на каждую строку.
+    Возвращает {"created", "updated", "errors"} как раньше.
+    progress — необязательный callback, получает число прочитанных строк после каждой пачки.
+    """
+    lookups = {
+        "region_id": (Region, set(Region.objects.values_list("pk", flat=True))),
+        "resource_type_id": (ResourceType, set(ResourceType.objects.values_list("pk", flat=True))),
+        "water_type_id": (WaterType, set(WaterType.objects.values_list("pk", flat=True))),
+    }
+
+    created = 0
+    updated = 0
+    errors = []
+
+    numbered = enumerate(rows, start=start)
+    processed = 0
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        chunk_created, chunk_updated = _import_chunk(chunk, lookups, errors)
+        created += chunk_created
+        updated += chunk_updated
+        processed += len(chunk)
+        if progress is not None:
+            progress(processed)
+
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "created": created,
+        "updated": updated,
+        "errors": errors,
+    }
+
+
+def _import_chunk(chunk, lookups, errors):
+    to_create = []
+    to_update = []
+
+    for idx, row in chunk:
+        # пропускаем пустые строки
+        if all(cell is None for cell in row):
+            continue
+        try:
+            obj_id, obj_data = _parse_row(row, lookups)
+        except Exception as exc:
+            errors.append({"row": idx, "error": _error_text(exc)})
+            continue
+
+        if obj_id:
+            to_update.append((idx, obj_id, obj_data))
+        else:
+            to_create.append((idx, obj_data))
+
+    existing = Object.objects.in_bulk(
+        {obj_id for _idx, obj_id, _data in to_update},
+        field_name="pk",
+    ) if to_update else {}
+
+    new_objects = [Object(**obj_data) for _idx, obj_data in to_create]
+    # Object.priority и код уровня сразу пишутся уже посчитанными, чтобы пересчёт не обновлял их вторым запросом
+    formula = get_formula()
+    for obj, score in zip(new_objects, formula.scores(
+        {field: [getattr(obj, field) for obj in new_objects] for field in formula.fields},
+    )):
+        obj.priority = score
+        obj.priority_level = LEVEL_CODES[formula.level(score)]
+        # bulk_create не вызывает Object.save(), поэтому код дня паспорта ставим сами
+        obj.passport_md = passport_month_day(obj.passport_date)
+
+    changed = {}
+    changed_fields = set()
+    moved_from = []
+    stats = StatsDelta()
+    updated = 0
+    # строки, дошедшие до записи: при ошибке БД в отчёт попадают только они
+    written = [idx for idx, _data in to_create]
+
+    for idx, obj_id, obj_data in to_update:
+        obj = existing.get(obj_id)
+        if obj is None:
+            errors.append({"row": idx, "error": "Object matching query does not exist."})
+            continue
+        written.append(idx)
+        if (obj.latitude, obj.longitude) != (obj_data["latitude"], obj_data["longitude"]):
+            moved_from.append((obj.latitude, obj.longitude))
+        stats.remove_object(obj.region_id, obj.resource_type_id, obj.technical_condition)
+        for field, value in obj_data.items():
+            if getattr(obj, field) != value:
+                setattr(obj, field, value)
+                changed_fields.add(field)
+                changed[obj.pk] = obj
+        if "passport_date" in changed_fields and obj.passport_md != passport_month_day(obj.passport_date):
+            obj.passport_md = passport_month_day(obj.passport_date)
+            changed_fields.add("passport_md")
+        stats.add_object(obj.region_id, obj.resource_type_id, obj.technical_condition)
+        updated += 1
+
+    for obj in new_objects:
+        stats.add_object(obj.region_id, obj.resource_type_id, obj.technical_condition)
+
+    try:
+        with transaction.atomic():
+            if new_objects:
+                Object.objects.bulk_create(new_objects)
+            if changed:
+                # пишем только изменившиеся строки и только изменившиеся поля
+                Object.objects.bulk_update(list(changed.values()), sorted(changed_fields))
+
+            recalc_ids = [obj.pk for obj in new_objects] + list(changed)
+            if recalc_ids:
+                recalculate_priorities(Object.objects.filter(pk__in=recalc_ids))
+            renamed = new_objects + (list(changed.values()) if "name" in changed_fields else [])
+            index_object_names((obj.pk, obj.name) for obj in renamed)
+            stats.flush()
+            if new_objects or changed:
+                bump_table_version(Object)
+                invalidate_points(
+                    [(obj.latitude, obj.longitude) for obj in new_objects]
+                    + [(obj.latitude, obj.longitude) for obj in changed.values()]
+                    + moved_from
+                )
+    except DatabaseError as exc:
+        for idx in sorted(written):
+            errors.append({"row": idx, "error": str(exc)})
+        return 0, 0
+
+    return len(new_objects), updated
+
+
+def _parse_row(row, lookups):
+    row = tuple(row) + (None,) * (len(OBJECT_XLSX_HEADERS) - len(row))
+    (
+        obj_id,
+        name,
+        region_id,
+        resource_type_id,
+        water_type_id,
+        fauna,
+        passport_date,
+        technical_condition,
+        latitude,
+        longitude,
+        _pdf_name,
+        priority,
+        _created_at,
+    ) = row[:len(OBJECT_XLSX_HEADERS)]
+
+    if name is None:
+        raise ValidationError({"name": Object._meta.get_field("name").error_messages["null"]})
+
+    obj_data = {
+        "name": name,
+        "region_id": _lookup_pk(lookups["region_id"], region_id),
+        "resource_type_id": _lookup_pk(lookups["resource_type_id"], resource_type_id),
+        "water_type_id": _lookup_pk(lookups["water_type_id"], water_type_id),
+        "fauna": bool(fauna),
+        "passport_date": _to_python("passport_date", passport_date),
+        "technical_condition": int(technical_condition) if technical_condition is not None else 0,
+        "latitude": _to_python("latitude", latitude),
+        "longitude": _to_python("longitude", longitude),
+        "priority": int(priority) if priority is not None else 0,
+    }
+    return (int(obj_id) if obj_id else None), obj_data
+
+
+def _lookup_pk(lookup, value):
+    model, known = lookup
+    try:
+        pk = int(value)
+    except (TypeError, ValueError):
+        pk = None
+    if pk not in known:
+        raise model.DoesNotExist(f"{model.__name__} matching query does not exist.")
+    return pk
+
+
+def _to_python(field_name, value):
+    field = Object._meta.get_field(field_name)
+    if value is None:
+        raise ValidationError({field_name: field.error_messages["null"]})
+    return field.to_python(value)
+
+
+def _error_text(exc):
+    if isinstance(exc, ValidationError) and hasattr(exc, "message_dict"):
+        return "; ".join(
+            f"{field}: {' '.join(messages)}" for field, messages in exc.message_dict.items()
+        )
+    return str(exc)
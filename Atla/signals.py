@@ -1,26 +1,109 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Object, PriorityScore
-from .services.priority import calculate_priority_score
-from .models import PriorityLevel
-from datetime import date
+from .models import AIRiskAssessment, Object, PriorityScore, Region, ResourceType, WaterType
+from .caching import bump_table_version
+from .services.recalc_queue import mark_dirty, needs_recalc
+from .services.search import index_object_names
+from .services.stats import StatsDelta
+from .services.tiles import invalidate_points
 
 
 @receiver(post_save, sender=Object)
-def update_priority_score(sender, instance: Object, created, **kwargs):
-    score = calculate_priority_score(instance, today=date.today())
+def update_priority_score(sender, instance: Object, created, update_fields=None, **kwargs):
+    # Пересчёт откладывается до коммита и идёт одним пакетом на все изменённые объекты;
+    # правки, не затрагивающие состояние и дату паспорта, приоритет не меняют
+    if needs_recalc(instance, created, update_fields):
+        mark_dirty(instance.pk)
 
-    if score >= 12:
-        level = PriorityLevel.HIGH
-    elif score >= 6:
-        level = PriorityLevel.MEDIUM
+
+STATS_FIELDS = ("region_id", "resource_type_id", "technical_condition")
+
+
+@receiver(pre_save, sender=Object)
+def remember_stats_snapshot(sender, instance: Object, **kwargs):
+    # значения до сохранения — чтобы сводка дашборда вычла их из старых срезов
+    instance._stats_old = None
+    if instance._state.adding:
+        return
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    if all(field in loaded for field in STATS_FIELDS):
+        instance._stats_old = tuple(loaded[field] for field in STATS_FIELDS)
     else:
-        level = PriorityLevel.LOW
+        instance._stats_old = Object.objects.filter(pk=instance.pk).values_list(*STATS_FIELDS).first()
+
+
+@receiver(post_save, sender=Object)
+def update_statistics(sender, instance: Object, created, **kwargs):
+    old = getattr(instance, "_stats_old", None)
+    new = tuple(getattr(instance, field) for field in STATS_FIELDS)
+    if old == new:
+        return
+
+    stats = StatsDelta()
+    if old is not None:
+        stats.remove_object(*old)
+    stats.add_object(*new)
+    stats.flush()
+
+
+@receiver(pre_delete, sender=Object)
+def remember_priority_level(sender, instance: Object, **kwargs):
+    # PriorityScore удаляется каскадом раньше post_delete объекта
+    instance._level_old = PriorityScore.objects.filter(obj_id=instance.pk).values_list("level", flat=True).first()
+
+
+@receiver(post_delete, sender=Object)
+def update_statistics_on_delete(sender, instance: Object, **kwargs):
+    stats = StatsDelta()
+    stats.remove_object(*(getattr(instance, field) for field in STATS_FIELDS))
+    stats.move_level(getattr(instance, "_level_old", None), None)
+    stats.flush()
+
+
+@receiver(post_save, sender=Object)
+def invalidate_map_tiles(sender, instance: Object, created, **kwargs):
+    points = [(instance.latitude, instance.longitude)]
+    loaded = getattr(instance, "_loaded_values", None)
+    if loaded and "latitude" in loaded and "longitude" in loaded:
+        # старое положение объекта, если его передвинули
+        points.append((loaded["latitude"], loaded["longitude"]))
+    invalidate_points(points)
+
+
+@receiver(post_delete, sender=Object)
+def invalidate_map_tiles_on_delete(sender, instance: Object, **kwargs):
+    invalidate_points([(instance.latitude, instance.longitude)])
+
+
+@receiver(post_save, sender=Object)
+def update_search_index(sender, instance: Object, created, **kwargs):
+    # FTS-индекс обновляют триггеры БД, триграммы — здесь и только при смене названия
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    if created or loaded.get("name", None) != instance.name:
+        index_object_names([(instance.pk, instance.name)])
+
+
+@receiver(post_save, sender=Object)
+@receiver(post_save, sender=PriorityScore)
+@receiver(post_save, sender=AIRiskAssessment)
+def invalidate_list_etags(sender, **kwargs):
+    # ETag списков (ConditionalMixin) — версия таблицы; пакетные сервисы сбрасывают её сами
+    bump_table_version(sender)
+
+
+@receiver(post_delete, sender=Object)
+def invalidate_list_etags_on_delete(sender, **kwargs):
+    # приоритет и оценка ИИ удаляются каскадом; своих post_delete у них нет,
+    # чтобы каскад оставался быстрым удалением без загрузки строк
+    bump_table_version(Object, PriorityScore, AIRiskAssessment)
 
-    priority_obj, _ = PriorityScore.objects.get_or_create(obj=instance)
-    priority_obj.score = score
-    priority_obj.level = level
-    priority_obj.save()
 
-    # Обновляем priority у Object без вызова сигналов
-    Object.objects.filter(id=instance.id).update(priority=score)
\ No newline at end of file
+@receiver(post_save, sender=Region)
+@receiver(post_save, sender=ResourceType)
+@receiver(post_save, sender=WaterType)
+@receiver(post_delete, sender=Region)
+@receiver(post_delete, sender=ResourceType)
+@receiver(post_delete, sender=WaterType)
+def invalidate_reference_cache(sender, **kwargs):
+    # справочники кэшируются целиком — любое изменение сбрасывает версию таблицы
+    bump_table_version(sender)
@@ -1,3 +1,1067 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import parse_http_date
+
+from openpyxl import Workbook
+
+from GidroAtlas.db_router import PrimaryReplicaRouter, primary_reads_since, routing
+from GidroAtlas.middleware import ReplicaRoutingMiddleware, registry
+
+from .models import LEVEL_CODES, AIRiskAssessment, Job, JobKind, JobStatus, Object, ObjectStatistic, PriorityHistory, PriorityScore, Region, ResourceType, WaterType
+from .serializer import ObjectSerializer
+from .services import ai_priority, recalc_queue
+from .services.aging import age_priorities, aging_queryset, birthday_codes
+from .services.jobs import claim_next_job, enqueue_job, reap_stale_jobs, run_job, run_worker
+from .services.priority import FORMULAS, register_formula
+from .services.recalc import recalculate_priorities, shadow_evaluate
+from .services.search import fts_available, search_object_ids
+from .services.stats import rebuild_statistics
+from .services.synthetic import generate_dataset, parse_scale
+from .services.tiles import _tile_version_key, point_tile
+from .services.xlsx import OBJECT_XLSX_HEADERS, import_object_rows, open_objects_workbook, write_objects_xlsx
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def make_objects(count, **extra):
+    region = Region.objects.create(name="Алматинская")
+    resource_type = ResourceType.objects.create(name="Озеро")
+    water_type = WaterType.objects.create(name="Пресная")
+    # пересчёт приоритета выполняется после коммита — в тестах вызываем колбэки сразу
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        return [
+            Object.objects.create(
+                name=f"Объект {i}",
+                region=region,
+                resource_type=resource_type,
+                water_type=water_type,
+                passport_date=date(2000, 1, 1),
+                technical_condition=i % 6,
+                latitude=43.25,
+                longitude=76.95,
+                **extra,
+            )
+            for i in range(count)
+        ]
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ObjectListQueryCountTests(TestCase):
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/atla/objects/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        make_objects(2)
+        _response, small = self.list_queries()
+
+        make_objects(20)
+        response, large = self.list_queries()
+
+        self.assertEqual(small, large)
+        row = response.json()["results"][0]
+        self.assertEqual(row["region_name"], "Алматинская")
+        self.assertEqual(row["water_type_name"], "Пресная")
+        self.assertIsNotNone(row["priority_level"])
+
+    def test_sparse_fieldsets(self):
+        make_objects(2)
+        row = self.client.get("/atla/objects/?fields=id,name,priority_level").json()["results"][0]
+        self.assertEqual(set(row), {"id", "name", "priority_level"})
+
+        row = self.client.get("/atla/objects/?omit=pdf_url,ai_risk").json()["results"][0]
+        self.assertNotIn("pdf_url", row)
+        self.assertNotIn("ai_risk", row)
+        self.assertIn("region_name", row)
+
+    def test_map_points_are_compact_tuples(self):
+        obj = make_objects(1)[0]
+        self.assertEqual(self.client.get("/atla/objects/map/?bbox=76,43,77,44").json(), [
+            [obj.pk, 43.25, 76.95, obj.priority_score.level],
+        ])
+
+    def test_fast_list_matches_serializer_output(self):
+        objects = make_objects(3)
+        Object.objects.filter(pk=objects[0].pk).update(pdf="passports/a.pdf", water_type=None)
+        AIRiskAssessment.objects.create(obj=objects[1], risk_prob=0.7, explanation="ok", fingerprint="x", model="m")
+
+        for url in ("/atla/objects/", "/atla/objects/?omit=pdf_url", "/atla/priority-scores/", "/atla/objects/?pagination=cursor"):
+            fast = self.client.get(url)
+            slow = self.client.get(url + ("&" if "?" in url else "?") + "fast=0")
+            self.assertEqual(fast.content, slow.content.replace(b"fast=0&", b"").replace(b"&fast=0", b""), url)
+
+    def test_detail_is_single_joined_query(self):
+        obj = make_objects(1)[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/atla/objects/{obj.pk}/")
+        self.assertEqual(response.json()["priority_score"], obj.priority_score.score)
+
+
+def exported_rows(queryset):
+    buffer = io.BytesIO()
+    write_objects_xlsx(queryset, buffer)
+    buffer.seek(0)
+    wb, ws, header = open_objects_workbook(buffer)
+    try:
+        return header, [list(row) for row in ws.iter_rows(min_row=2, values_only=True)]
+    finally:
+        wb.close()
+
+
+def xlsx_upload(rows):
+    wb = Workbook()
+    wb.active.append(OBJECT_XLSX_HEADERS)
+    for row in rows:
+        wb.active.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    buffer.name = "objects.xlsx"
+    return buffer
+
+
+def new_object_row(obj, name="Новый"):
+    # справочники — как у obj
+    return [None, name, obj.region_id, obj.resource_type_id, obj.water_type_id, True, "1990-05-01", 3, 50.1, 70.2, "", 0, None]
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReferenceCacheTests(TestCase):
+    def test_cached_until_write(self):
+        Region.objects.create(name="Алматинская")
+        first = self.client.get("/atla/regions/")
+        etag = first["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/atla/regions/").json(), first.json())
+            self.assertEqual(self.client.get("/atla/regions/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post("/atla/regions/", {"name": "Абайская"}, content_type="application/json")
+        self.assertEqual(created.status_code, 201)
+        response = self.client.get("/atla/regions/")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual([row["name"] for row in response.json()["results"]], ["Алматинская", "Абайская"])
+        self.assertEqual(self.client.get("/atla/regions/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Region.objects.get(name="Абайская").delete()
+        response = self.client.get(f"/atla/regions/{created.json()['id']}/")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotEqual(self.client.get("/atla/regions/")["ETag"], etag)
+
+    def test_pagination_links_follow_the_request_host(self):
+        Region.objects.bulk_create([Region(name="Алматинская"), Region(name="Абайская")])
+        internal = self.client.get("/atla/regions/?page_size=1", HTTP_HOST="localhost").json()
+        self.assertTrue(internal["next"].startswith("http://localhost/"))
+        public = self.client.get("/atla/regions/?page_size=1", HTTP_HOST="atlas.example.com", secure=True).json()
+        self.assertTrue(public["next"].startswith("https://atlas.example.com/"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PaginationTests(TestCase):
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            self.assertNotIn("count", body)
+            ids += [row["id"] for row in body["results"]]
+            url = body["next"]
+        return ids
+
+    def test_cursor_walks_every_row_once_with_ties(self):
+        make_objects(7)  # состояния 0..5 и повтор 0 — равные priority
+        expected = list(Object.objects.order_by("-priority", "-id").values_list("pk", flat=True))
+        self.assertEqual(self.walk("/atla/objects/?pagination=cursor&page_size=2"), expected)
+        self.assertEqual(self.walk("/atla/objects/?pagination=cursor&page_size=3&fast=0"), expected)
+
+        expected = list(Object.objects.order_by("created_at", "id").values_list("pk", flat=True))
+        self.assertEqual(self.walk("/atla/objects/?pagination=cursor&page_size=2&ordering=created_at"), expected)
+
+        expected = list(PriorityScore.objects.order_by("-score", "-id").values_list("pk", flat=True))
+        self.assertEqual(self.walk("/atla/priority-scores/?pagination=cursor&page_size=2"), expected)
+
+        self.assertEqual(self.client.get("/atla/objects/?cursor=not-a-cursor").status_code, 404)
+
+    def test_page_number_shape(self):
+        make_objects(3)
+        for name in ("Акмолинская", "Абайская"):
+            Region.objects.create(name=name)
+        body = self.client.get("/atla/regions/?page_size=2").json()
+        self.assertEqual(set(body), {"count", "next", "previous", "results"})
+        self.assertEqual((body["count"], len(body["results"]), body["previous"]), (3, 2, None))
+        self.assertIn("page=2", body["next"])
+
+        body = self.client.get("/atla/objects/?page=2&page_size=2").json()
+        self.assertEqual((body["count"], len(body["results"]), body["next"]), (3, 1, None))
+        self.assertEqual(self.client.get("/atla/objects/?page=9").status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class GeoFilterTests(TestCase):
+    def setUp(self):
+        objects = make_objects(4)
+        # Алматы, ~5.5 км севернее, ~20 км восточнее, Астана
+        for obj, (lat, lon) in zip(objects, [(43.25, 76.95), (43.30, 76.95), (43.25, 77.20), (51.17, 71.43)]):
+            Object.objects.filter(pk=obj.pk).update(latitude=lat, longitude=lon)
+        self.ids = [obj.pk for obj in objects]
+
+    def ids_for(self, query):
+        response = self.client.get(f"/atla/objects/?{query}")
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_bbox(self):
+        self.assertEqual(sorted(self.ids_for("bbox=76.9,43.2,77.0,43.35")), self.ids[:2])
+        self.assertEqual(self.client.get("/atla/objects/?bbox=77,43,76,44").status_code, 400)
+
+    def test_near_orders_by_distance_and_radius_cuts(self):
+        self.assertEqual(self.ids_for("near=43.25,76.95"), self.ids)
+        self.assertEqual(self.ids_for("near=43.25,76.95&radius_km=10"), self.ids[:2])
+        self.assertEqual(self.ids_for("near=43.25,76.95&radius_km=25"), self.ids[:3])
+        self.assertEqual(self.ids_for("near=51.0,71.5&radius_km=50"), self.ids[3:])
+        self.assertEqual(self.client.get("/atla/objects/?near=95,10").status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class XlsxExportTests(TestCase):
+    def test_export_streams_all_objects(self):
+        objects = make_objects(3)
+        Object.objects.filter(pk=objects[1].pk).update(pdf="passports/b.pdf")
+        response = self.client.get("/atla/objects/export_xls/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="objects.xlsx"')
+
+        wb, ws, header = open_objects_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        rows = list(ws.iter_rows(min_row=2, values_only=True))
+        wb.close()
+        self.assertEqual(header, OBJECT_XLSX_HEADERS)
+        self.assertEqual([row[0] for row in rows], [obj.pk for obj in objects])
+        first = Object.objects.get(pk=objects[0].pk)
+        self.assertEqual(rows[0][1:12], (
+            first.name, first.region_id, first.resource_type_id, first.water_type_id, True,
+            "2000-01-01", first.technical_condition, 43.25, 76.95, None, first.priority,
+        ))
+        self.assertEqual(rows[1][10], "passports/b.pdf")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class XlsxImportTests(TestCase):
+    def test_export_import_round_trip(self):
+        objects = make_objects(3)
+        header, rows = exported_rows(Object.objects.all())
+        self.assertEqual(header, OBJECT_XLSX_HEADERS)
+        self.assertEqual([row[0] for row in rows], [obj.pk for obj in objects])
+
+        rows[0][7] = 5
+        rows.append(new_object_row(objects[0]))
+        response = self.client.post("/atla/objects/import_xls/", {"file": xlsx_upload(rows)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"created": 1, "updated": 3, "errors": []})
+
+        changed = Object.objects.get(pk=objects[0].pk)
+        self.assertEqual(changed.technical_condition, 5)
+        self.assertEqual(changed.priority, PriorityScore.objects.get(obj=changed).score)
+        created = Object.objects.get(name="Новый")
+        self.assertEqual(created.priority, PriorityScore.objects.get(obj=created).score)
+        # неизменённые строки файла ничего не меняют
+        _header, again = exported_rows(Object.objects.filter(pk__in=[obj.pk for obj in objects[1:]]))
+        self.assertEqual(again, rows[1:3])
+
+    def test_errors_are_reported_per_row(self):
+        obj = make_objects(1)[0]
+        bad_region = new_object_row(obj)
+        bad_region[2] = 999
+        missing_name = new_object_row(obj)
+        missing_name[1] = None
+        missing_date = new_object_row(obj)
+        missing_date[6] = None
+        unknown_id = new_object_row(obj)
+        unknown_id[0] = 99999
+
+        result = import_object_rows([
+            bad_region,
+            missing_name,
+            missing_date,
+            unknown_id,
+            [None] * len(OBJECT_XLSX_HEADERS),
+            new_object_row(obj),
+        ])
+        self.assertEqual((result["created"], result["updated"]), (1, 0))
+        self.assertEqual([error["row"] for error in result["errors"]], [2, 3, 4, 5])
+        self.assertIn("Region matching query does not exist", result["errors"][0]["error"])
+        self.assertIn("name", result["errors"][1]["error"])
+        self.assertIn("passport_date", result["errors"][2]["error"])
+        self.assertEqual(result["errors"][3]["error"], "Object matching query does not exist.")
+
+    def test_database_error_reports_each_row_once(self):
+        obj = make_objects(1)[0]
+        _header, rows = exported_rows(Object.objects.all())
+        rows[0][7] = 5
+        unknown_id = new_object_row(obj)
+        unknown_id[0] = 99999
+
+        with mock.patch("Atla.services.xlsx.recalculate_priorities", side_effect=DatabaseError("boom")):
+            result = import_object_rows([rows[0], unknown_id])
+        self.assertEqual((result["created"], result["updated"]), (0, 0))
+        self.assertEqual(result["errors"], [
+            {"row": 2, "error": "boom"},
+            {"row": 3, "error": "Object matching query does not exist."},
+        ])
+        self.assertEqual(Object.objects.get(pk=obj.pk).technical_condition, obj.technical_condition)
+
+    def test_query_count_per_chunk_does_not_depend_on_rows(self):
+        def import_queries(count):
+            objects = make_objects(count)
+            _header, rows = exported_rows(Object.objects.filter(pk__in=[obj.pk for obj in objects]))
+            for row in rows:
+                row[7] = 5
+            rows += [new_object_row(objects[0]) for _ in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                result = import_object_rows(rows)
+            self.assertEqual((result["created"], result["updated"], result["errors"]), (count, count, []))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(import_queries(2), import_queries(20))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def test_async_export_runs_in_worker_and_downloads(self):
+        make_objects(3)
+        response = self.client.get("/atla/objects/export_xls/?async=1")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        self.assertEqual(self.client.get(f"/atla/jobs/{job_id}/download/").status_code, 404)
+
+        run_worker(once=True)
+        job = self.client.get(f"/atla/jobs/{job_id}/").json()
+        self.assertEqual((job["status"], job["result"], job["processed"], job["total"]), ("done", {"exported": 3}, 3, 3))
+
+        response = self.client.get(f"/atla/jobs/{job_id}/download/")
+        self.assertEqual(response.status_code, 200)
+        wb, ws, header = open_objects_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(header, OBJECT_XLSX_HEADERS)
+        self.assertEqual(len(list(ws.iter_rows(min_row=2, values_only=True))), 3)
+        wb.close()
+
+    def test_claim_takes_oldest_pending_once(self):
+        first = enqueue_job(JobKind.RECALC_PRIORITIES)
+        enqueue_job(JobKind.RECALC_PRIORITIES)
+        claimed = claim_next_job()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (first.pk, JobStatus.RUNNING, 1))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertNotEqual(claim_next_job().pk, first.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_failed_handler_is_recorded(self):
+        job = enqueue_job(JobKind.IMPORT_XLS)
+        run_job(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertTrue(job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOB_STALE_TIMEOUT=60)
+    def test_stale_running_jobs_are_requeued_or_failed(self):
+        old = timezone.now() - timedelta(minutes=5)
+        retry = Job.objects.create(kind=JobKind.EXPORT_XLS, status=JobStatus.RUNNING, heartbeat_at=old, attempts=1)
+        exhausted = Job.objects.create(kind=JobKind.EXPORT_XLS, status=JobStatus.RUNNING, heartbeat_at=old, attempts=3)
+        import_job = Job.objects.create(kind=JobKind.IMPORT_XLS, status=JobStatus.RUNNING, started_at=old, attempts=1)
+        alive = Job.objects.create(kind=JobKind.IMPORT_XLS, status=JobStatus.RUNNING, heartbeat_at=timezone.now(), attempts=1)
+
+        self.assertEqual(reap_stale_jobs(), 3)
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {
+            retry.pk: JobStatus.PENDING,
+            exhausted.pk: JobStatus.FAILED,
+            import_job.pk: JobStatus.FAILED,
+            alive.pk: JobStatus.RUNNING,
+        })
+
+        # воркер, которого сочли мёртвым, не перезаписывает задачу по завершении
+        retry.status = JobStatus.RUNNING
+        run_job(retry)
+        retry.refresh_from_db()
+        self.assertEqual((retry.status, retry.result), (JobStatus.PENDING, None))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MapTileTests(TestCase):
+    def test_tiles_are_cached_until_objects_change(self):
+        objects = make_objects(3)
+        url = "/atla/objects/clusters/?z=0&x=0&y=0"
+        first = self.client.get(url).json()["clusters"]
+        self.assertEqual(sum(cluster["count"] for cluster in first), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()["clusters"], first)
+
+        obj = Object.objects.get(pk=objects[0].pk)
+        obj.technical_condition = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        clusters = self.client.get(url).json()["clusters"]
+        self.assertEqual(clusters[0]["max_score"], max(Object.objects.values_list("priority", flat=True)))
+        self.assertNotEqual(clusters, first)
+
+    def tile_url(self, obj, z):
+        x, y = point_tile(float(obj.latitude), float(obj.longitude), z)
+        return f"/atla/objects/clusters/?z={z}&x={x}&y={y}"
+
+    def test_point_on_tile_edge_is_counted_once(self):
+        obj = make_objects(1)[0]
+        Object.objects.filter(pk=obj.pk).update(latitude=50, longitude=45)
+        x, y = point_tile(50.0, 45.0, 3)
+        self.assertEqual(x, 5)
+
+        counts = {}
+        for dx in (-1, 0):
+            clusters = self.client.get(f"/atla/objects/clusters/?z=3&x={x + dx}&y={y}").json()["clusters"]
+            counts[x + dx] = sum(cluster["count"] for cluster in clusters)
+        self.assertEqual(counts, {4: 0, 5: 1})
+
+        # точка на восточной границе ячеек тайла 4 не даёт девятый столбец
+        clusters = self.client.get(f"/atla/objects/clusters/?z=3&x={x}&y={y}").json()["clusters"]
+        self.assertEqual(len(clusters), 1)
+
+    def test_edit_invalidates_only_tiles_of_the_object(self):
+        near, far = make_objects(2)
+        far.latitude, far.longitude = 10, -60
+        with self.captureOnCommitCallbacks(execute=True):
+            far.save()
+        near_url, far_url = self.tile_url(near, 5), self.tile_url(far, 5)
+        self.client.get(near_url)
+        self.client.get(far_url)
+
+        far.name = "Переименован"
+        with self.captureOnCommitCallbacks(execute=True):
+            far.save()
+        with self.assertNumQueries(0):
+            self.client.get(near_url)
+
+        # перенос сбрасывает и старый, и новый тайл
+        far.latitude, far.longitude = near.latitude, near.longitude
+        with self.captureOnCommitCallbacks(execute=True):
+            far.save()
+        self.assertEqual(self.client.get(far_url).json()["clusters"], [])
+        self.assertEqual(self.client.get(near_url).json()["clusters"][0]["count"], 2)
+
+    def test_evicted_version_does_not_serve_old_aggregate(self):
+        obj = make_objects(1)[0]
+        url = self.tile_url(obj, 4)
+        self.assertEqual(self.client.get(url).json()["clusters"][0]["count"], 1)
+
+        # запись мимо сигналов, затем версия тайла выпадает из кэша (cull FileBasedCache)
+        Object.objects.filter(pk=obj.pk).update(latitude=-10)
+        x, y = point_tile(float(obj.latitude), float(obj.longitude), 4)
+        cache.delete(_tile_version_key(4, x, y))
+        self.assertEqual(self.client.get(url).json()["clusters"], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ObjectWriteResponseTests(TransactionTestCase):
+    # автокоммит как в работе: пересчёт после коммита выполняется внутри запроса
+    def test_patch_response_shows_recalculated_priority(self):
+        obj = make_objects(1)[0]
+        initial = PriorityScore.objects.get(obj=obj).score
+        response = self.client.patch(
+            f"/atla/objects/{obj.pk}/",
+            encode_multipart(BOUNDARY, {"technical_condition": 5}),
+            content_type=MULTIPART_CONTENT,
+        )
+        self.assertEqual(response.status_code, 200)
+        score = PriorityScore.objects.get(obj=obj)
+        self.assertNotEqual(score.score, initial)
+        self.assertEqual(response.json()["priority_score"], score.score)
+        self.assertEqual(response.json()["priority"], score.score)
+
+    def test_priority_is_read_only(self):
+        self.assertTrue(ObjectSerializer().fields["priority"].read_only)
+        obj = make_objects(1)[0]
+        response = self.client.patch(
+            f"/atla/objects/{obj.pk}/",
+            encode_multipart(BOUNDARY, {"priority": 999, "name": "Переименован"}),
+            content_type=MULTIPART_CONTENT,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Переименован")
+        self.assertEqual(response.json()["priority"], PriorityScore.objects.get(obj=obj).score)
+
+    def test_saving_a_deleted_row_needs_force_insert(self):
+        obj = Object.objects.get(pk=make_objects(1)[0].pk)
+        Object.objects.filter(pk=obj.pk).delete()
+        with self.assertRaises(DatabaseError):
+            obj.save()
+        obj.save(force_insert=True)
+        self.assertTrue(Object.objects.filter(pk=obj.pk).exists())
+
+
+def index_name(model, *fields):
+    return next(index.name for index in model._meta.indexes if tuple(index.fields) == fields)
+
+
+@skipUnless(connection.vendor == "sqlite", "планы проверяются на SQLite (планировщик без статистики детерминирован)")
+@override_settings(CACHES=LOCMEM_CACHE)
+class QueryPlanTests(TestCase):
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {index}", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_hot_filters_use_indexes(self):
+        objects = Object.objects.order_by("-priority", "-id")
+        for field in ("region", "resource_type", "water_type"):
+            self.assertUsesIndex(objects.filter(**{field: 1})[:50], index_name(Object, field, "priority", "id"))
+
+        plan = objects.filter(passport_date__gte=date(2020, 1, 1), passport_date__lte=date(2020, 12, 31)).explain()
+        self.assertIn(f"USING INDEX {index_name(Object, 'passport_date')}", plan)
+
+        self.assertUsesIndex(
+            PriorityScore.objects.filter(level="high").order_by("-score", "-id")[:50],
+            index_name(PriorityScore, "level", "score", "id"),
+        )
+        # «высокие в регионе X по score» — один диапазон индекса, без JOIN PriorityScore
+        self.assertUsesIndex(
+            Object.objects.filter(region=1, priority_level=2).order_by("-priority", "-id")[:50],
+            index_name(Object, "region", "priority_level", "priority", "id"),
+        )
+
+    def test_list_count_does_not_join(self):
+        make_objects(2)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/atla/objects/?region=1")
+        count_sql = next(query["sql"] for query in ctx.captured_queries if "COUNT(" in query["sql"])
+        self.assertNotIn("JOIN", count_sql)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PriorityLevelColumnTests(TestCase):
+    def test_level_is_kept_on_object_and_filterable(self):
+        objects = make_objects(6)
+        for obj in Object.objects.select_related("priority_score"):
+            self.assertEqual(obj.priority_level, LEVEL_CODES[obj.priority_score.level])
+            self.assertEqual(obj.priority, obj.priority_score.score)
+
+        high = [obj.pk for obj in Object.objects.filter(priority_score__level="high").order_by("-priority", "-id")]
+        self.assertTrue(high)
+        rows = self.client.get("/atla/objects/?priority_level=high&ordering=-priority").json()["results"]
+        self.assertEqual([row["id"] for row in rows], high)
+        self.assertEqual(self.client.get("/atla/objects/?priority_level=urgent").status_code, 400)
+
+        threshold = max(obj.priority for obj in Object.objects.all())
+        rows = self.client.get(f"/atla/objects/?priority__gte={threshold}").json()["results"]
+        self.assertTrue(rows and all(row["priority"] >= threshold for row in rows))
+
+        # смена состояния меняет уровень тем же пересчётом
+        obj = Object.objects.get(pk=objects[0].pk)
+        obj.technical_condition = 5 if obj.priority_level < 2 else 0
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        obj.refresh_from_db()
+        self.assertEqual(obj.priority_level, LEVEL_CODES[PriorityScore.objects.get(obj=obj).level])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ConditionalRequestTests(TestCase):
+    def test_unchanged_lists_answer_304_without_queries(self):
+        obj = make_objects(2)[0]
+        for url in ("/atla/objects/", f"/atla/objects/{obj.pk}/", f"/atla/priority-scores/{obj.pk}/by-object/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            with self.assertNumQueries(0):
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(cached.status_code, 304, url)
+
+    def test_writes_change_the_etag(self):
+        obj = make_objects(2)[0]
+        objects_etag = self.client.get("/atla/objects/")["ETag"]
+        scores_etag = self.client.get("/atla/priority-scores/")["ETag"]
+
+        obj.technical_condition = 5 - obj.technical_condition
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+
+        self.assertEqual(self.client.get("/atla/objects/", HTTP_IF_NONE_MATCH=objects_etag).status_code, 200)
+        # пакетный пересчёт тоже сбрасывает версию приоритетов
+        self.assertEqual(self.client.get("/atla/priority-scores/", HTTP_IF_NONE_MATCH=scores_etag).status_code, 200)
+
+    def test_write_in_the_same_second_is_newer_for_if_modified_since(self):
+        obj = make_objects(1)[0]
+        with mock.patch("Atla.caching.time.time", return_value=2_000_000_000.2):
+            for name in ("Первое имя", "Второе имя"):
+                last_modified = self.client.get("/atla/objects/")["Last-Modified"]
+                obj.name = name
+                with self.captureOnCommitCallbacks(execute=True):
+                    obj.save()
+            response = self.client.get("/atla/objects/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(parse_http_date(response["Last-Modified"]), parse_http_date(last_modified))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.staff = get_user_model().objects.create_user("staff@example.com", "pass", is_staff=True)
+
+    def test_server_timing_and_metrics_endpoint(self):
+        make_objects(3)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/atla/objects/?fast=0")
+        queries = len(ctx.captured_queries)
+        timing = response["Server-Timing"]
+        self.assertIn(f'desc="{queries} queries"', timing)
+        for name in ("db;", "serializer;", "render;", "total;"):
+            self.assertIn(name, timing)
+
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+        self.client.force_login(self.staff)
+        stats = self.client.get("/api/metrics/").json()["object-list"]
+        self.assertEqual(stats["count"], 1)
+        self.assertEqual(stats["queries"]["max"], queries)
+        self.assertEqual(sum(stats["latency_ms"]["histogram"].values()), 1)
+        self.assertIsNotNone(stats["serializer_ms"]["p99"])
+
+    def test_profile_header_is_staff_only(self):
+        make_objects(1)
+        response = self.client.get("/atla/objects/", HTTP_X_PROFILE="tottime")
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        self.client.force_login(self.staff)
+        response = self.client.get("/atla/objects/", HTTP_X_PROFILE="tottime")
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b"function calls", response.content)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(SimpleTestCase):
+    router = PrimaryReplicaRouter()
+
+    def test_reads_go_to_replica_until_first_write(self):
+        self.assertEqual(self.router.db_for_read(Object), "default")  # вне запроса
+        with routing():
+            self.assertEqual(self.router.db_for_read(Object), "replica")
+            self.assertEqual(self.router.db_for_write(Object), "default")
+            self.assertEqual(self.router.db_for_read(Object), "default")
+        self.assertFalse(self.router.allow_migrate("replica", "Atla"))
+
+    def test_fresh_versions_are_read_from_primary(self):
+        with routing():
+            # кэш и ETag под версией, которой меньше окна отставания реплики, — с основной БД
+            with primary_reads_since(time.time()):
+                self.assertEqual(self.router.db_for_read(Object), "default")
+            self.assertEqual(self.router.db_for_read(Object), "replica")
+            with primary_reads_since(time.time() - 60):
+                self.assertEqual(self.router.db_for_read(Object), "replica")
+
+    def test_middleware_pins_writes_and_following_reads(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Object))
+            if request.method == "POST":
+                self.router.db_for_write(Object)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+        self.assertNotIn("db_pin", middleware(factory.get("/atla/objects/")).cookies)
+
+        response = middleware(factory.post("/atla/objects/"))
+        self.assertIn("db_pin", response.cookies)
+
+        pinned = factory.get("/atla/objects/")
+        pinned.COOKIES["db_pin"] = "1"
+        middleware(pinned)
+        self.assertEqual(seen, ["replica", "default", "default"])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SyntheticDatasetTests(TestCase):
+    FIELDS = ("name", "region__name", "water_type__name", "passport_date", "technical_condition", "latitude", "longitude")
+
+    def generate(self, seed):
+        Object.objects.all().delete()
+        generate_dataset(30, seed=seed, batch_size=7)
+        return list(Object.objects.order_by("pk").values_list(*self.FIELDS))
+
+    def test_same_seed_gives_same_rows_with_derived_data(self):
+        first = self.generate(seed=1)
+        self.assertEqual(first, self.generate(seed=1))
+        self.assertNotEqual(first, self.generate(seed=2))
+        self.assertEqual(PriorityScore.objects.count(), 30)
+        self.assertTrue(search_object_ids(first[0][0].split()[0]))
+        self.assertEqual(parse_scale("100k"), 100_000)
+
+
+def statistic_rows():
+    return {
+        (stat.dimension, stat.key): (stat.count, stat.condition_sum)
+        for stat in ObjectStatistic.objects.all()
+        if stat.count or stat.condition_sum
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class IncrementalStatisticsTests(TestCase):
+    def test_incremental_counters_match_rebuild(self):
+        objects = make_objects(4)
+        other_region = Region.objects.create(name="Акмолинская")
+        with self.captureOnCommitCallbacks(execute=True):
+            obj = Object.objects.get(pk=objects[0].pk)
+            obj.technical_condition = 5
+            obj.save()
+            # повторное сохранение того же экземпляра не должно учитывать перенос дважды
+            obj.region = other_region
+            obj.save()
+            obj.save()
+            obj.technical_condition = 1
+            obj.save(update_fields=["technical_condition"])
+            Object.objects.get(pk=objects[1].pk).delete()
+            Object.objects.create(
+                name="Новый", region=other_region, resource_type_id=objects[2].resource_type_id,
+                passport_date=date(1990, 5, 1), technical_condition=4, latitude=50, longitude=70,
+            )
+
+        incremental = statistic_rows()
+        rebuild_statistics()
+        self.assertEqual(incremental, statistic_rows())
+        self.assertEqual(incremental[("region", str(other_region.pk))], (2, 5))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DeferredRecalcTests(TestCase):
+    def test_unrelated_edit_does_not_schedule_recalc(self):
+        obj = Object.objects.get(pk=make_objects(1)[0].pk)
+        obj.name = "Переименован"
+        with self.captureOnCommitCallbacks() as callbacks:
+            obj.save()
+        self.assertNotIn(recalc_queue.flush, callbacks)
+
+    def test_reverted_edit_of_same_instance_is_recalculated(self):
+        obj = Object.objects.get(pk=make_objects(1)[0].pk)
+        original = obj.technical_condition
+        initial = PriorityScore.objects.get(obj=obj).score
+        obj.technical_condition = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        # сохранение без пересчёта не затирает priority устаревшим значением из памяти
+        obj.name = "Переименован"
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        score = PriorityScore.objects.get(obj=obj)
+        self.assertNotEqual(score.score, initial)
+        self.assertEqual(Object.objects.filter(pk=obj.pk).values_list("priority", flat=True).get(), score.score)
+
+        obj.technical_condition = original
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        score = PriorityScore.objects.get(obj=obj)
+        fresh = Object.objects.get(pk=obj.pk)
+        self.assertEqual(score.score, initial)
+        self.assertEqual((fresh.priority, fresh.priority_level), (score.score, LEVEL_CODES[score.level]))
+
+    def test_saves_in_transaction_are_recalculated_in_one_batch(self):
+        make_objects(3)
+        objects = list(Object.objects.order_by("pk"))
+
+        with mock.patch.object(recalc_queue, "recalculate_priorities", wraps=recalc_queue.recalculate_priorities) as recalc:
+            with self.captureOnCommitCallbacks(execute=True):
+                for obj in objects:
+                    obj.technical_condition = 5
+                    obj.save()
+
+        recalc.assert_called_once()
+        self.assertEqual(sorted(recalc.call_args.args[0].values_list("pk", flat=True)), [obj.pk for obj in objects])
+        # одинаковые состояние и дата паспорта — одинаковый приоритет, синхронный с Object.priority
+        scores = set(Object.objects.values_list("priority", "priority_score__score"))
+        self.assertEqual(len(scores), 1)
+        self.assertEqual(len(set(scores.pop())), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BulkRecalcTests(TestCase):
+    def test_batches_create_update_and_skip_unchanged(self):
+        objects = make_objects(6)
+        PriorityScore.objects.filter(obj=objects[0]).delete()
+        PriorityScore.objects.filter(obj__in=objects[1:3]).update(score=-1)
+
+        result = recalculate_priorities(batch_size=4)
+        self.assertEqual((result["processed"], result["created"], result["updated"]), (6, 1, 2))
+        for obj in Object.objects.select_related("priority_score"):
+            self.assertEqual((obj.priority_score.score, obj.priority_score.level), PriorityScore(obj=obj).recalc(save=False))
+            self.assertEqual((obj.priority, obj.priority_level), (obj.priority_score.score, LEVEL_CODES[obj.priority_score.level]))
+
+        # ничего не изменилось: на пачку два чтения (объекты и их PriorityScore), записей нет
+        with self.assertNumQueries(4):
+            result = recalculate_priorities(batch_size=4)
+        self.assertEqual((result["created"], result["updated"]), (0, 0))
+
+    def test_queries_per_batch_do_not_depend_on_batch_size(self):
+        def recalc_queries(count):
+            ids = [obj.pk for obj in make_objects(count)]
+            queryset = Object.objects.filter(pk__in=ids)
+            queryset.update(technical_condition=1)
+            recalculate_priorities(queryset)
+            # у всех объектов один новый score — один групповой UPDATE на таблицу
+            queryset.update(technical_condition=5)
+            with CaptureQueriesContext(connection) as ctx:
+                result = recalculate_priorities(queryset, batch_size=count)
+            self.assertEqual(result["updated"], count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(recalc_queries(3), recalc_queries(12))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PriorityAgingTests(TestCase):
+    def test_feb_29_passports_age_on_march_1_in_common_years(self):
+        self.assertEqual(birthday_codes(date(2025, 3, 1)), {301, 229})
+        self.assertEqual(birthday_codes(date(2024, 3, 1)), {301})
+        self.assertEqual(birthday_codes(date(2024, 2, 29)), {229})
+
+    def test_only_birthday_objects_are_recalculated_with_catch_up(self):
+        make_objects(3)
+        objects = list(Object.objects.order_by("pk"))
+        for obj, passport_date in zip(objects, [date(2000, 6, 1), date(2000, 6, 3), date(2000, 9, 1)]):
+            obj.passport_date = passport_date
+        with self.captureOnCommitCallbacks(execute=True):
+            for obj in objects:
+                obj.save()
+
+        self.assertEqual(list(aging_queryset(date(2030, 6, 1))), [objects[0]])
+        self.assertEqual(list(aging_queryset(date(2030, 6, 3), since=date(2030, 5, 31))), objects[:2])
+
+        result = age_priorities(date(2030, 6, 3), since=date(2030, 5, 31))
+        self.assertEqual(result["processed"], 2)
+        obj = Object.objects.select_related("priority_score").get(pk=objects[0].pk)
+        self.assertEqual(obj.priority_score.score, (6 - obj.technical_condition) * 3 + 30)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FormulaRegistryTests(TestCase):
+    def test_shadow_evaluation_compares_without_writing(self):
+        register_formula("test-flat", fields=("technical_condition",))(lambda columns, today: [20] * len(columns["technical_condition"]))
+        self.addCleanup(FORMULAS.pop, "test-flat")
+        make_objects(4)
+        stored = list(PriorityScore.objects.order_by("pk").values_list("score", "level", "formula_version"))
+
+        result = shadow_evaluate("test-flat")
+
+        self.assertEqual(result["processed"], 4)
+        self.assertEqual(result["candidate_levels"], {"high": 4})
+        self.assertEqual(sum(result["current_levels"].values()), 4)
+        self.assertEqual(result["candidate_avg_score"], 20)
+        self.assertEqual(list(PriorityScore.objects.order_by("pk").values_list("score", "level", "formula_version")), stored)
+
+    def test_unknown_version_is_rejected(self):
+        with self.assertRaises(ValueError):
+            shadow_evaluate("missing")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PriorityHistoryTests(TestCase):
+    def test_history_records_changes_and_worsened_objects(self):
+        objects = make_objects(2)
+        Object.objects.update(passport_date=date(2029, 1, 1), technical_condition=5)
+        recalculate_priorities(today=date(2030, 6, 1))
+        # повторный пересчёт без изменений новых точек не добавляет
+        recalculate_priorities(today=date(2030, 6, 10))
+        Object.objects.filter(pk=objects[0].pk).update(technical_condition=1)
+        recalculate_priorities(today=date(2030, 7, 1))
+
+        trend = self.client.get(f"/atla/priority-history/?obj={objects[0].pk}&date_after=2030-01-01").json()["results"]
+        self.assertEqual([(row["date"], row["level"]) for row in trend], [("2030-06-01", "low"), ("2030-07-01", "high")])
+        self.assertEqual(PriorityHistory.objects.filter(obj=objects[1], date__gte=date(2030, 1, 1)).count(), 1)
+
+        worsened = self.client.get("/atla/priority-history/worsened/?since=2030-06-15").json()["results"]
+        self.assertEqual([(row["object_id"], row["level_before"], row["level_now"]) for row in worsened], [
+            (objects[0].pk, "low", "high"),
+        ])
+        self.assertEqual(self.client.get("/atla/priority-history/worsened/").status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ObjectSearchTests(TestCase):
+    def setUp(self):
+        self.lake, self.reservoir, self.river = make_objects(3)
+        for obj, name in ((self.lake, "Озеро Балқаш"), (self.reservoir, "Капшагайское водохранилище"), (self.river, "Река Ёлкина")):
+            obj.name = name
+            obj.save()
+
+    def test_prefix_case_and_yo_folding(self):
+        self.assertTrue(fts_available())
+        self.assertEqual(search_object_ids("балқ"), [self.lake.pk])
+        self.assertEqual(search_object_ids("КАПШ вод"), [self.reservoir.pk])
+        self.assertEqual(search_object_ids("елкина"), [self.river.pk])
+
+    def test_typo_falls_back_to_trigrams(self):
+        self.assertEqual(search_object_ids("Капшагаиское", limit=1), [self.reservoir.pk])
+
+    def test_list_search_and_autocomplete(self):
+        self.reservoir.name = "Бартогай водохранилище"
+        self.reservoir.save()
+
+        rows = self.client.get("/atla/objects/?search=водохр").json()["results"]
+        self.assertEqual([row["id"] for row in rows], [self.reservoir.pk])
+        self.assertEqual(self.client.get("/atla/objects/autocomplete/?q=барт").json(), [
+            {"id": self.reservoir.pk, "name": "Бартогай водохранилище"},
+        ])
+
+    def test_list_search_returns_every_match_in_rank_order(self):
+        extra = make_objects(7)
+        for obj in extra:
+            obj.name = f"Канал {obj.pk}"
+            obj.save()
+        self.river.name = "Канал Канал"
+        self.river.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get("/atla/objects/?search=канал&page_size=3").json()
+        self.assertEqual(body["count"], 8)
+        # совпадения выбираются подзапросом к индексу, без списка id и CASE в SQL
+        count_sql = next(query["sql"] for query in queries if "COUNT(" in query["sql"])
+        self.assertIn("atla_object_fts", count_sql)
+        self.assertFalse(any("CASE" in query["sql"] for query in queries))
+        # два вхождения слова ранжируются выше одного
+        self.assertEqual(body["results"][0]["id"], self.river.pk)
+
+        seen = []
+        # клиенты передают запрос URL-кодированным, ссылка next строится из него
+        url = f"/atla/objects/?search={quote('канал')}&pagination=cursor&page_size=3"
+        while url:
+            page = self.client.get(url).json()
+            seen += [row["id"] for row in page["results"]]
+            url = page["next"]
+        self.assertEqual(sorted(seen), sorted([self.river.pk, *(obj.pk for obj in extra)]))
+        self.assertEqual(seen[0], self.river.pk)
+
+        rows = self.client.get("/atla/objects/?search=Капшагаиское").json()["results"]
+        self.assertEqual([row["id"] for row in rows], [self.reservoir.pk])
+
+
+class _StubAIHandler(BaseHTTPRequestHandler):
+    """
+    Заглушка OpenRouter: отвечает фиксированным JSON с задержкой и считает параллельные запросы.
+    """
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        time.sleep(0.05)
+        with server.lock:
+            server.active -= 1
+
+        content = json.dumps({"risk_prob": 0.4, "explanation": "stub"})
+        body = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+        self.send_response(server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AIRiskAnalysisTests(TestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _StubAIHandler)
+        server.lock = threading.Lock()
+        server.requests = server.active = server.peak = 0
+        server.status = 200
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+
+        url = f"http://127.0.0.1:{server.server_port}/chat/completions"
+        overrides = self.settings(OPENROUTER_URL=url, AI_RISK_MAX_WORKERS=4)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_requests_are_concurrent_and_cached(self):
+        objects = make_objects(8)
+        items = [(obj, obj.priority) for obj in objects]
+
+        results = ai_priority.analyze_objects(items)
+
+        self.assertEqual(results[objects[0].pk], (0.4, "stub"))
+        self.assertEqual(len(results), 8)
+        self.assertEqual(self.server.requests, 8)
+        self.assertGreater(self.server.peak, 1)
+        self.assertLessEqual(self.server.peak, 4)
+
+        # неизменившиеся объекты повторно в ИИ не уходят
+        self.assertEqual(ai_priority.analyze_objects(items), results)
+        self.assertEqual(ai_priority.analyze_object_with_ai(objects[0], objects[0].priority), (0.4, "stub"))
+        self.assertEqual(self.server.requests, 8)
+
+        objects[0].technical_condition = 5
+        ai_priority.analyze_objects([(objects[0], objects[0].priority)])
+        self.assertEqual(self.server.requests, 9)
+
+    def test_failures_are_raised_and_surfaced(self):
+        obj = make_objects(1)[0]
+        self.server.status = 400  # без повторов, в отличие от 429/5xx
+        with self.assertRaises(ai_priority.AIAnalysisError):
+            ai_priority.analyze_object_with_ai(obj, obj.priority)
+        self.assertEqual(ai_priority.analyze_objects([(obj, obj.priority)]), {})
+
+        response = self.client.post(f"/atla/objects/{obj.pk}/analyze_risk/")
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("AI risk analysis failed", response.json()["detail"])
+        self.assertFalse(AIRiskAssessment.objects.exists())
+
+        self.server.status = 200
+        response = self.client.post(f"/atla/objects/{obj.pk}/analyze_risk/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["risk_prob"], response.json()["stale"]), (0.4, False))
+
+    def test_stored_risk_is_embedded_without_outbound_calls(self):
+        make_objects(3)
+        objects = list(Object.objects.select_related("priority_score").order_by("pk"))
+        ai_priority.analyze_objects([(obj, obj.priority_score.score) for obj in objects[:2]])
+        requests_before = self.server.requests
+
+        rows = {row["id"]: row for row in self.client.get("/atla/objects/").json()["results"]}
+        self.assertEqual(rows[objects[0].pk]["ai_risk"]["risk_prob"], 0.4)
+        self.assertFalse(rows[objects[0].pk]["ai_risk"]["stale"])
+        self.assertIsNone(rows[objects[2].pk]["ai_risk"])
+
+        ids = ",".join(str(obj.pk) for obj in objects)
+        stored = self.client.get(f"/atla/ai-risks/?obj__in={ids}").json()["results"]
+        self.assertEqual(sorted(row["object_id"] for row in stored), sorted(obj.pk for obj in objects[:2]))
+        self.assertEqual(self.server.requests, requests_before)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RegionViewSet, ResourceTypeViewSet, WaterTypeViewSet, ObjectViewSet, PriorityScoreViewSet
+from .views import RegionViewSet, ResourceTypeViewSet, WaterTypeViewSet, ObjectViewSet, PriorityScoreViewSet, PriorityHistoryViewSet, AIRiskAssessmentViewSet, JobViewSet, StatisticsViewSet
 
 router = DefaultRouter()
 router.register(r'regions', RegionViewSet)
@@ -8,6 +8,10 @@ router.register(r'resource-types', ResourceTypeViewSet)
 router.register(r'water-types', WaterTypeViewSet)
 router.register(r'objects', ObjectViewSet)
 router.register(r'priority-scores', PriorityScoreViewSet)
+router.register(r'priority-history', PriorityHistoryViewSet)
+router.register(r'ai-risks', AIRiskAssessmentViewSet)
+router.register(r'jobs', JobViewSet)
+router.register(r'statistics', StatisticsViewSet, basename='statistics')
 
 
 urlpatterns = [
@@ -1,28 +1,79 @@
 from rest_framework import viewsets, filters
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
-from io import BytesIO
-from openpyxl import Workbook, load_workbook
-from .models import ResourceType, WaterType, Object, PriorityScore, Region
+from django.http import FileResponse, Http404
+from datetime import date
+from types import SimpleNamespace
+from django.db.models import F, OuterRef, Subquery
+from .models import (
+    ResourceType,
+    WaterType,
+    Object,
+    PriorityScore,
+    PriorityHistory,
+    Region,
+    Job,
+    JobKind,
+    JobStatus,
+    AIRiskAssessment,
+    LEVEL_CODES,
+    LEVEL_NAMES,
+)
 from .serializer import (
     RegionSerializer,
     ResourceTypeSerializer,
     WaterTypeSerializer,
     ObjectSerializer,
     PriorityScoreSerializer,
+    PriorityHistorySerializer,
+    JobSerializer,
+    AIRiskAssessmentSerializer,
+    ai_risk_representation,
 )
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.renderers import BrowsableAPIRenderer
+from GidroAtlas.renderers import FastJSONRenderer
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
-from .services.priority import calculate_priority_score
-from .models import PriorityLevel
-from datetime import date
+from rest_framework.exceptions import ValidationError
+from .services import geo
+from .services.ai_priority import AIAnalysisError, analyze_object_with_ai
+from .services.search import autocomplete, search_objects
+from .caching import CachedReferenceMixin, ConditionalMixin
+from .fastpath import FastListMixin
+from .services.jobs import enqueue_job
+from .services.recalc import recalculate_priorities
+from .services.stats import dashboard_statistics
+from .services.tiles import get_tile_clusters
+from .services.xlsx import (
+    OBJECT_XLSX_HEADERS,
+    export_objects_response,
+    import_object_rows,
+    open_objects_workbook,
+)
 import django_filters
 
 
+def wants_async(request) -> bool:
+    """
+    ?async=1 — поставить тяжёлую операцию в очередь фоновых задач вместо выполнения в запросе.
+    """
+    return request.query_params.get("async", "").lower() in ("1", "true", "yes")
+
+
+def job_accepted_response(job):
+    return Response({
+        "job_id": job.id,
+        "status": job.status,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
 class ObjectFilter(django_filters.FilterSet):
     passport_date = django_filters.DateFromToRangeFilter(field_name="passport_date")
+    bbox = django_filters.CharFilter(method="filter_bbox", label="min_lon,min_lat,max_lon,max_lat")
+    near = django_filters.CharFilter(method="filter_near", label="lat,lon (сортировка по расстоянию)")
+    radius_km = django_filters.NumberFilter(method="filter_radius_km", label="Радиус для near, км")
+    priority_level = django_filters.CharFilter(method="filter_priority_level", label="low, medium, high (через запятую)")
 
     class Meta:
         model = Object
@@ -32,217 +83,328 @@ class ObjectFilter(django_filters.FilterSet):
             "water_type": ["exact"],
             "fauna": ["exact"],
             "technical_condition": ["exact"],
+            "priority": ["gte", "lte"],
         }
 
+    def filter_priority_level(self, queryset, name, value):
+        """
+        Уровень по коду на самом объекте (Object.priority_level), без JOIN PriorityScore.
+        """
+        levels = {part.strip().lower() for part in value.split(",") if part.strip()}
+        unknown = sorted(levels - set(LEVEL_CODES))
+        if unknown:
+            raise ValidationError({"priority_level": f"Unknown levels {unknown}, expected low, medium, high"})
+        codes = sorted(LEVEL_CODES[level] for level in levels)
+        if len(codes) == 1:
+            return queryset.filter(priority_level=codes[0])
+        return queryset.filter(priority_level__in=codes)
+
+    def filter_bbox(self, queryset, name, value):
+        try:
+            bbox = geo.parse_bbox(value)
+        except ValueError as exc:
+            raise ValidationError({"bbox": f"Expected min_lon,min_lat,max_lon,max_lat: {exc}"})
+        return geo.filter_bbox(queryset, *bbox)
+
+    def filter_near(self, queryset, name, value):
+        """
+        Ближайшие объекты к точке. С radius_km отбираются только объекты внутри круга.
+        """
+        try:
+            lat, lon = geo.parse_point(value)
+        except ValueError as exc:
+            raise ValidationError({"near": f"Expected lat,lon: {exc}"})
+
+        radius_km = self.form.cleaned_data.get("radius_km")
+        if radius_km is not None:
+            queryset = geo.filter_radius(queryset, lat, lon, float(radius_km))
+        else:
+            queryset = geo.annotate_distance(queryset, lat, lon)
+        return queryset.order_by("distance_sq", "pk")
+
+    def filter_radius_km(self, queryset, name, value):
+        # используется в filter_near
+        return queryset
+
+
+class ObjectSearchFilter(filters.SearchFilter):
+    """
+    ?search= по названию через индекс поиска (FTS5 + триграммы) вместо LIKE '%...%'.
+    Результаты упорядочены по релевантности.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = " ".join(self.get_search_terms(request))
+        if not query:
+            return queryset
+        return search_objects(queryset, query).order_by("search_rank", "id")
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """
+    ?ordering= с id в конце (в направлении последнего поля): порядок страниц
+    однозначен при равных значениях и совпадает с индексами (поле, ..., id).
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or request.query_params.get(self.ordering_param) is None:
+            return ordering
+        if any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            return ordering
+        return [*ordering, "-id" if ordering[-1].startswith("-") else "id"]
 
-class RegionViewSet(viewsets.ModelViewSet):
-    queryset = Region.objects.all()
+
+class RegionViewSet(CachedReferenceMixin, viewsets.ModelViewSet):
+    queryset = Region.objects.order_by("id")
     serializer_class = RegionSerializer
 
 
-class ResourceTypeViewSet(viewsets.ModelViewSet):
-    queryset = ResourceType.objects.all()
+class ResourceTypeViewSet(CachedReferenceMixin, viewsets.ModelViewSet):
+    queryset = ResourceType.objects.order_by("id")
     serializer_class = ResourceTypeSerializer
 
 
-class WaterTypeViewSet(viewsets.ModelViewSet):
-    queryset = WaterType.objects.all()
+class WaterTypeViewSet(CachedReferenceMixin, viewsets.ModelViewSet):
+    queryset = WaterType.objects.order_by("id")
     serializer_class = WaterTypeSerializer
 
 
-class ObjectViewSet(viewsets.ModelViewSet):
-    queryset = Object.objects.all()
+class ObjectViewSet(ConditionalMixin, FastListMixin, viewsets.ModelViewSet):
+    # приоритет и справочники подтягиваются одним JOIN, без запроса на каждую строку
+    queryset = Object.objects.select_related(
+        "priority_score", "ai_risk", "region", "resource_type", "water_type",
+    ).order_by("-priority", "-id")
     serializer_class = ObjectSerializer
-    filter_backends = [filters.SearchFilter, django_filters.rest_framework.DjangoFilterBackend]
+    filter_backends = [ObjectSearchFilter, django_filters.rest_framework.DjangoFilterBackend, StableOrderingFilter]
     search_fields = ["name"]
     filterset_class = ObjectFilter
+    # ?ordering=-priority_level,-priority; без параметра — порядок queryset (или релевантность поиска)
+    ordering_fields = ["priority", "priority_level", "created_at"]
     parser_classes = [MultiPartParser, FormParser]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # в ответ попадают приоритет, оценка ИИ и названия из справочников
+    etag_models = (Object, PriorityScore, AIRiskAssessment, Region, ResourceType, WaterType)
+
+    # быстрый путь списка (FastListMixin): поле ответа → колонка values()
+    fast_columns = {
+        "id": "id",
+        "name": "name",
+        "region": "region_id",
+        "resource_type": "resource_type_id",
+        "water_type": "water_type_id",
+        "fauna": "fauna",
+        "passport_date": "passport_date",
+        "technical_condition": "technical_condition",
+        "latitude": "latitude",
+        "longitude": "longitude",
+        "priority": "priority",
+        "created_at": "created_at",
+        "region_name": "region__name",
+        "resource_type_name": "resource_type__name",
+        "water_type_name": "water_type__name",
+        "priority_score": "priority_score__score",
+        "priority_level": "priority_score__level",
+    }
+    fast_extra_columns = (
+        "pdf",
+        "ai_risk__id",
+        "ai_risk__risk_prob",
+        "ai_risk__explanation",
+        "ai_risk__analyzed_at",
+        "ai_risk__fingerprint",
+    )
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self._reload(serializer)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self._reload(serializer)
+
+    def _reload(self, serializer):
+        # пересчёт приоритета пишет строки после коммита, а не в этот экземпляр:
+        # ответ строится по свежей строке вместе с priority_score и справочниками
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
+    def fast_pdf(self, row):
+        return row["pdf"] or None
+
+    def fast_pdf_url(self, row):
+        if not row["pdf"]:
+            return None
+        url = Object._meta.get_field("pdf").storage.url(row["pdf"])
+        if url.startswith("/"):
+            if not hasattr(self, "_absolute_root"):
+                self._absolute_root = self.request.build_absolute_uri("/")[:-1]
+            return self._absolute_root + url
+        return self.request.build_absolute_uri(url)
+
+    def fast_ai_risk(self, row):
+        if row["ai_risk__id"] is None:
+            return None
+        entry = AIRiskAssessment(
+            risk_prob=row["ai_risk__risk_prob"],
+            explanation=row["ai_risk__explanation"],
+            analyzed_at=row["ai_risk__analyzed_at"],
+            fingerprint=row["ai_risk__fingerprint"],
+        )
+        # поля, из которых считается отпечаток (см. ai_priority.object_fingerprint)
+        obj = SimpleNamespace(
+            name=row["name"],
+            region=row["region__name"],
+            resource_type=row["resource_type__name"],
+            water_type=row["water_type__name"],
+            fauna=row["fauna"],
+            technical_condition=row["technical_condition"],
+            passport_date=row["passport_date"],
+        )
+        score = row["priority_score__score"]
+        return ai_risk_representation(entry, obj, score if score is not None else row["priority"])
 
     @action(detail=False, methods=["get"])
     def export_xls(self, request):
         """
         Экспорт объектов в XLSX.
+        С ?async=1 возвращает job_id, файл скачивается через /atla/jobs/<id>/download/.
         """
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Objects"
-
-        headers = [
-            "id",
-            "name",
-            "region_id",
-            "resource_type_id",
-            "water_type_id",
-            "fauna",
-            "passport_date",
-            "technical_condition",
-            "latitude",
-            "longitude",
-            "pdf",
-            "priority",
-            "created_at",
-        ]
-        ws.append(headers)
-
-        queryset = Object.objects.select_related("region", "resource_type", "water_type")
-        for obj in queryset:
-            ws.append([
-                obj.id,
-                obj.name,
-                obj.region_id,
-                obj.resource_type_id,
-                obj.water_type_id,
-                obj.fauna,
-                obj.passport_date.isoformat() if obj.passport_date else None,
-                obj.technical_condition,
-                float(obj.latitude) if obj.latitude is not None else None,
-                float(obj.longitude) if obj.longitude is not None else None,
-                obj.pdf.name if obj.pdf else "",
-                obj.priority,
-                obj.created_at.isoformat() if obj.created_at else None,
-            ])
-
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = 'attachment; filename="objects.xlsx"'
-        return response
+        if wants_async(request):
+            return job_accepted_response(enqueue_job(JobKind.EXPORT_XLS))
+
+        return export_objects_response(Object.objects.all())
 
     @action(detail=False, methods=["post"])
     def import_xls(self, request):
         """
         Импорт объектов из XLSX.
         Ожидается файл в `file` с колонками как у экспорта.
+        С ?async=1 файл ставится в очередь, отчёт появится в результате задачи.
         """
         upload = request.FILES.get("file")
         if not upload:
             return Response({"detail": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+        if wants_async(request):
+            return job_accepted_response(enqueue_job(JobKind.IMPORT_XLS, input_file=upload))
+
         try:
-            wb = load_workbook(upload)
-            ws = wb.active
+            wb, ws, header = open_objects_workbook(upload)
         except Exception as exc:
             return Response({"detail": f"Invalid XLSX file: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        created = 0
-        updated = 0
-        errors = []
-
-        header = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1, values_only=False))]
-        expected_headers = [
-            "id",
-            "name",
-            "region_id",
-            "resource_type_id",
-            "water_type_id",
-            "fauna",
-            "passport_date",
-            "technical_condition",
-            "latitude",
-            "longitude",
-            "pdf",
-            "priority",
-            "created_at",
-        ]
-        if header != expected_headers:
-            return Response({"detail": "Unexpected headers", "expected": expected_headers, "got": header}, status=status.HTTP_400_BAD_REQUEST)
-
-        for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-            # пропускаем пустые строки
-            if all(cell is None for cell in row):
-                continue
-            try:
-                (
-                    obj_id,
-                    name,
-                    region_id,
-                    resource_type_id,
-                    water_type_id,
-                    fauna,
-                    passport_date,
-                    technical_condition,
-                    latitude,
-                    longitude,
-                    pdf_name,
-                    priority,
-                    _created_at,
-                ) = row
-
-                region = Region.objects.get(pk=region_id)
-                resource_type = ResourceType.objects.get(pk=resource_type_id)
-                water_type = WaterType.objects.get(pk=water_type_id)
-
-                obj_data = {
-                    "name": name,
-                    "region": region,
-                    "resource_type": resource_type,
-                    "water_type": water_type,
-                    "fauna": bool(fauna),
-                    "passport_date": passport_date,
-                    "technical_condition": int(technical_condition) if technical_condition is not None else 0,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "priority": int(priority) if priority is not None else 0,
-                }
-
-                if obj_id:
-                    obj = Object.objects.get(pk=obj_id)
-                    for field, value in obj_data.items():
-                        setattr(obj, field, value)
-                    obj.save()
-                    updated += 1
-                else:
-                    Object.objects.create(**obj_data)
-                    created += 1
-            except Exception as exc:
-                errors.append({"row": idx, "error": str(exc)})
+        try:
+            if header != OBJECT_XLSX_HEADERS:
+                return Response({"detail": "Unexpected headers", "expected": OBJECT_XLSX_HEADERS, "got": header}, status=status.HTTP_400_BAD_REQUEST)
+
+            result = import_object_rows(ws.iter_rows(min_row=2, values_only=True))
+        finally:
+            wb.close()
+
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """
+        Подсказки по названию для поиска по мере ввода: ?q=&limit= (до 50).
+        Учитывает префиксы слов, регистр, ё/е и опечатки.
+        """
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        return Response(autocomplete(request.query_params.get("q", ""), limit), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="map")
+    def map_points(self, request):
+        """
+        Компактные точки для карты: [[id, lat, lon, level], ...] (+ обычные фильтры списка, bbox).
+        Строится из values_list одной таблицы (уровень — Object.priority_level), без сериализатора и пагинации.
+        """
+        rows = self.filter_queryset(self.get_queryset()).values_list(
+            "id", "latitude", "longitude", "priority_level",
+        )
+        return Response(
+            [[pk, float(lat), float(lon), LEVEL_NAMES[level]] for pk, lat, lon, level in rows],
+            status=status.HTTP_200_OK,
+        )
 
+    @action(detail=False, methods=["get"])
+    def clusters(self, request):
+        """
+        Кластеры объектов для XYZ-тайла карты: ?z=&x=&y= (+ обычные фильтры списка).
+        Каждый кластер — count, центроид (lat, lon) и максимальный приоритет.
+        """
+        try:
+            z = int(request.query_params["z"])
+            x = int(request.query_params["x"])
+            y = int(request.query_params["y"])
+        except (KeyError, ValueError):
+            return Response({"detail": "z, x and y are required integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return Response({"detail": "tile is out of range"}, status=status.HTTP_400_BAD_REQUEST)
+
+        params = request.query_params.copy()
+        for key in ("z", "x", "y"):
+            params.pop(key, None)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        clusters = get_tile_clusters(queryset, z, x, y, params=params.urlencode())
         return Response({
-            "created": created,
-            "updated": updated,
-            "errors": errors,
+            "z": z,
+            "x": x,
+            "y": y,
+            "clusters": clusters,
         }, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
     def recalc_priority(self, request, pk=None):
         obj = self.get_object()
 
-        # считаем новую оценку
-        score = calculate_priority_score(obj, today=date.today())
-
-        # классификация
-        if score >= 12:
-            level = PriorityLevel.HIGH
-        elif score >= 6:
-            level = PriorityLevel.MEDIUM
-        else:
-            level = PriorityLevel.LOW
-
-        priority, _ = PriorityScore.objects.get_or_create(obj=obj)
-        priority.score = score
-        priority.level = level
-        priority.save()
-
-        # синхронизируем старое поле приоритета, если оно ещё используется
-        obj.priority = score
-        obj.save(update_fields=["priority"])
+        recalculate_priorities(Object.objects.filter(pk=obj.pk))
+        priority = PriorityScore.objects.get(obj=obj)
 
         return Response({
             "object_id": obj.id,
-            "new_score": score,
-            "level": level,
+            "new_score": priority.score,
+            "level": priority.level,
             "status": "updated"
         }, status=status.HTTP_200_OK)
 
 
-class PriorityScoreViewSet(viewsets.ModelViewSet):
-    queryset = PriorityScore.objects.all()
+    @action(detail=True, methods=["post"])
+    def analyze_risk(self, request, pk=None):
+        """
+        ИИ-оценка риска объекта. Если объект не менялся и ответ не устарел — сохранённая,
+        ?force=1 — запросить заново. 502, если ИИ не ответил.
+        """
+        obj = self.get_object()
+        score = obj.priority_score.score if hasattr(obj, "priority_score") else obj.priority
+        try:
+            analyze_object_with_ai(obj, score, force=request.query_params.get("force", "").lower() in ("1", "true", "yes"))
+        except AIAnalysisError as exc:
+            return Response({"detail": f"AI risk analysis failed: {exc}"}, status=status.HTTP_502_BAD_GATEWAY)
+
+        entry = AIRiskAssessment.objects.get(obj=obj)
+        return Response(ai_risk_representation(entry, obj, score), status=status.HTTP_200_OK)
+
+
+class PriorityScoreViewSet(ConditionalMixin, FastListMixin, viewsets.ModelViewSet):
+    queryset = PriorityScore.objects.order_by("-score", "-id")
     serializer_class = PriorityScoreSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    etag_models = (PriorityScore,)
+    filterset_fields = ["level"]
+
+    fast_columns = {
+        "id": "id",
+        "object_id": "obj_id",
+        "obj": "obj_id",
+        "score": "score",
+        "level": "level",
+        "formula_version": "formula_version",
+        "updated_at": "updated_at",
+    }
 
     @action(detail=False, methods=["post"])
     def recalc(self, request):
@@ -255,36 +417,146 @@ class PriorityScoreViewSet(viewsets.ModelViewSet):
 
         obj = get_object_or_404(Object, pk=object_id)
 
-        score = calculate_priority_score(obj, today=date.today())
-
-        if score >= 12:
-            level = PriorityLevel.HIGH
-        elif score >= 6:
-            level = PriorityLevel.MEDIUM
-        else:
-            level = PriorityLevel.LOW
-
-        priority_obj, _ = PriorityScore.objects.get_or_create(obj=obj)
-        priority_obj.score = score
-        priority_obj.level = level
-        priority_obj.save()
-
-        obj.priority = score
-        obj.save(update_fields=["priority"])
+        recalculate_priorities(Object.objects.filter(pk=obj.pk))
+        priority_obj = PriorityScore.objects.get(obj=obj)
 
         return Response({
             "object_id": obj.id,
-            "new_score": score,
-            "level": level,
+            "new_score": priority_obj.score,
+            "level": priority_obj.level,
             "status": "updated"
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["post"])
+    def recalc_all(self, request):
+        """
+        Массовый пересчёт приоритетов для всех объектов (с ?async=1 — фоновой задачей).
+        """
+        if wants_async(request):
+            return job_accepted_response(enqueue_job(JobKind.RECALC_PRIORITIES))
+
+        result = recalculate_priorities()
+        return Response(result, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=["get"], url_path="by-object")
     def get_by_object(self, request, pk=None):
         """
         Получить PriorityScore по ID объекта (obj_id).
+        С If-None-Match отвечает 304 без запросов к БД, если приоритеты не менялись.
         """
+        return self.conditional(request, lambda: self._priority_by_object(pk))
+
+    def _priority_by_object(self, pk):
         obj = get_object_or_404(Object, pk=pk)
         priority, _ = PriorityScore.objects.get_or_create(obj=obj)
         serializer = self.get_serializer(priority)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class PriorityHistoryFilter(django_filters.FilterSet):
+    date = django_filters.DateFromToRangeFilter(field_name="date")
+
+    class Meta:
+        model = PriorityHistory
+        fields = {
+            "obj": ["exact", "in"],
+            "region": ["exact"],
+        }
+
+
+class PriorityHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    История приоритета (тренды): ?obj=, ?obj__in=1,2,3 или ?region= и ?date_after=&date_before=.
+    Точки отсортированы по объекту и дате — каждая серия идёт подряд.
+    """
+    queryset = PriorityHistory.objects.order_by("obj_id", "date")
+    serializer_class = PriorityHistorySerializer
+    filterset_class = PriorityHistoryFilter
+
+    @action(detail=False, methods=["get"])
+    def worsened(self, request):
+        """
+        Объекты, у которых уровень приоритета сейчас выше, чем на дату ?since=YYYY-MM-DD (+ ?region=).
+        Кандидаты — только объекты с изменениями после since (индекс по дате), а не вся история.
+        """
+        try:
+            since = date.fromisoformat(request.query_params["since"])
+        except (KeyError, ValueError):
+            raise ValidationError({"since": "Expected date YYYY-MM-DD"})
+
+        changes = PriorityHistory.objects.filter(date__gt=since)
+        region = request.query_params.get("region")
+        if region:
+            if not region.isdigit():
+                raise ValidationError({"region": "Expected region id"})
+            changes = changes.filter(region_id=int(region))
+
+        points = PriorityHistory.objects.filter(obj=OuterRef("pk")).order_by("-date")
+        queryset = (
+            Object.objects.filter(pk__in=changes.values("obj_id"))
+            .annotate(
+                level_before=Subquery(points.filter(date__lte=since).values("level")[:1]),
+                level_now=Subquery(points.values("level")[:1]),
+                changed_at=Subquery(points.values("date")[:1]),
+            )
+            .filter(level_now__gt=F("level_before"))
+            .order_by("-level_now", "id")
+        )
+
+        page = self.paginate_queryset(queryset)
+        rows = [
+            {
+                "object_id": obj.id,
+                "name": obj.name,
+                "region_id": obj.region_id,
+                "level_before": PriorityHistory.LEVEL_NAMES[obj.level_before],
+                "level_now": PriorityHistory.LEVEL_NAMES[obj.level_now],
+                "changed_at": obj.changed_at,
+            }
+            for obj in page
+        ]
+        return self.get_paginated_response(rows)
+
+
+class AIRiskAssessmentViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Сохранённые ИИ-оценки риска. Пачкой по объектам: ?obj__in=1,2,3.
+    Только чтение — к ИИ эти запросы не обращаются.
+    """
+    queryset = AIRiskAssessment.objects.select_related(
+        "obj__priority_score", "obj__region", "obj__resource_type", "obj__water_type",
+    ).order_by("obj_id")
+    serializer_class = AIRiskAssessmentSerializer
+    filterset_fields = {"obj": ["exact", "in"]}
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Статус и прогресс фоновых задач.
+    """
+    queryset = Job.objects.order_by("-created_at", "-id")
+    serializer_class = JobSerializer
+    filterset_fields = ["kind", "status"]
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        """
+        Скачать файл результата (для экспорта).
+        """
+        job = self.get_object()
+        if job.status != JobStatus.DONE or not job.result_file:
+            raise Http404("Result file is not ready")
+        return FileResponse(
+            job.result_file.open("rb"),
+            as_attachment=True,
+            filename="objects.xlsx",
+        )
+
+
+class StatisticsViewSet(viewsets.ViewSet):
+    """
+    Сводка для дашборда из предрассчитанной таблицы (без сканирования объектов).
+    """
+
+    def list(self, request):
+        return Response(dashboard_statistics(), status=status.HTTP_200_OK)
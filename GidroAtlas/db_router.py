@@ -0,0 +1,90 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_routing = ContextVar("db_routing", default=None)
+
+
+class _Routing:
+    def __init__(self, pinned):
+        # pinned — чтения идут на основную БД (запрос пишет или недавно писал)
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_aliases():
+    return list(getattr(settings, "DATABASE_REPLICAS", ()))
+
+
+@contextmanager
+def routing(pinned=False):
+    """
+    Разрешить чтения с реплики внутри блока (безопасный HTTP-запрос).
+    Вне такого блока — команды, фоновые задачи, колбэки после коммита — всё
+    читается с основной БД: там сразу после записи нельзя отставать от неё.
+    """
+    state = _Routing(pinned)
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+@contextmanager
+def primary_reads_since(changed_at):
+    """
+    Чтения блока — с основной БД, если данные менялись меньше DATABASE_REPLICA_PIN_SECONDS
+    назад (changed_at — unix time последней записи, например last_modified версии таблицы).
+    Для кода, который кладёт прочитанное в кэш или выдаёт ETag под новой версией:
+    отстающая реплика иначе сохранила бы под ней старые данные.
+    """
+    state = _routing.get()
+    window = getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 5)
+    # last_modified хранится с точностью до секунды
+    if state is None or state.pinned or time.time() - changed_at > window + 1:
+        yield
+        return
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = state.wrote
+
+
+class PrimaryReplicaRouter:
+    """
+    Записи — в default, чтения в блоке routing() — на реплику (DATABASE_REPLICAS).
+    После первой записи блок закрепляется за основной БД, чтобы запрос видел
+    собственные изменения; в открытой транзакции чтения тоже идут в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        replicas = replica_aliases()
+        if state is None or state.pinned or not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплика — копия default: объекты, прочитанные из любой из них, можно связывать
+        aliases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема реплики приходит репликацией с основной БД
+        if db in replica_aliases():
+            return False
+        return None
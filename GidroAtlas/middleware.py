@@ -0,0 +1,289 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .db_router import replica_aliases, routing
+
+# Границы корзин гистограммы задержек, мс (последняя корзина — всё, что больше)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Замеры одного запроса: число и время SQL-запросов, именованные интервалы
+    (serializer, render, ...) и общее время.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.timings = {}
+        self._depth = {}
+
+    def execute(self, execute, sql, params, many, context):
+        # обёртка connection.execute_wrapper: считает каждый запрос к БД
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+    @contextmanager
+    def timed(self, name):
+        # вложенные интервалы с тем же именем (сериализатор внутри сериализатора) не суммируются дважды
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if depth == 0:
+                self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+    def server_timing(self, total):
+        parts = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"']
+        parts += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def timed(name):
+    """
+    Точка расширения для кода приложения: время блока попадает в Server-Timing
+    и метрики текущего запроса под именем name. Вне запроса ничего не делает.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.timed(name):
+        yield
+
+
+class EndpointStats:
+    """
+    Сводка по одному URL name: счётчики, гистограмма задержек и окно последних
+    замеров для перцентилей.
+    """
+
+    def __init__(self, window):
+        self.count = 0
+        self.errors = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency = deque(maxlen=window)
+        self.db = deque(maxlen=window)
+        self.timings = {}
+
+    def add(self, status_code, total_ms, metrics):
+        self.count += 1
+        if status_code >= 500:
+            self.errors += 1
+        self.queries += metrics.queries
+        self.max_queries = max(self.max_queries, metrics.queries)
+        self.histogram[bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+        self.latency.append(total_ms)
+        self.db.append(metrics.db_seconds * 1000)
+        for name, seconds in metrics.timings.items():
+            self.timings.setdefault(name, deque(maxlen=self.latency.maxlen)).append(seconds * 1000)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "queries": {"avg": round(self.queries / self.count, 2) if self.count else 0, "max": self.max_queries},
+            "latency_ms": {
+                **percentiles(self.latency),
+                "histogram": {
+                    **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram)},
+                    "inf": self.histogram[-1],
+                },
+            },
+            "db_ms": percentiles(self.db),
+            **{f"{name}_ms": percentiles(values) for name, values in self.timings.items()},
+        }
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+
+    def pick(q):
+        # nearest-rank
+        return round(values[min(len(values) - 1, max(0, int(q * len(values) + 0.5) - 1))], 2)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], 2)}
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов в памяти процесса (у каждого воркера свои), потокобезопасно.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, status_code, total_ms, metrics):
+        window = getattr(settings, "REQUEST_METRICS_WINDOW", 1000)
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(window)
+            stats.add(status_code, total_ms, metrics)
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self._endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Для каждого запроса считает SQL-запросы и их время, интервалы timed()
+    (сериализатор, рендеринг) и общую задержку; отдаёт их в заголовке
+    Server-Timing и копит по URL name для /api/metrics/.
+
+    Заголовок X-Profile (REQUEST_PROFILE_HEADER) от сотрудника (is_staff) вместо
+    ответа возвращает отчёт cProfile: X-Profile: cumulative | tottime | calls.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "REQUEST_METRICS_ENABLED", True):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        profiler = self._profiler(request)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics.execute))
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            _current.reset(token)
+
+        total = time.perf_counter() - metrics.started
+        match = getattr(request, "resolver_match", None)
+        endpoint = (match.view_name if match else None) or "<unresolved>"
+        registry.record(endpoint, response.status_code, total * 1000, metrics)
+
+        if profiler is not None:
+            return self._profile_response(request, profiler, metrics, total)
+        response["Server-Timing"] = metrics.server_timing(total)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Response рендерится после view: замеряем JSON/HTML-рендеринг отдельно
+        metrics = _current.get()
+        if metrics is not None and hasattr(response, "render"):
+            render = response.render
+
+            def timed_render():
+                # снимаем обёртку, чтобы ответ оставался обычным (например, для pickle в кэше)
+                del response.render
+                with metrics.timed("render"):
+                    return render()
+
+            response.render = timed_render
+        return response
+
+    def _profiler(self, request):
+        header = getattr(settings, "REQUEST_PROFILE_HEADER", "X-Profile")
+        if not request.headers.get(header) or not _is_staff(request):
+            return None
+        return cProfile.Profile()
+
+    def _profile_response(self, request, profiler, metrics, total):
+        header = getattr(settings, "REQUEST_PROFILE_HEADER", "X-Profile")
+        sort = request.headers.get(header).strip().lower()
+        if sort not in ("cumulative", "tottime", "calls"):
+            sort = "cumulative"
+        out = io.StringIO()
+        out.write(f"{request.method} {request.get_full_path()}\n{metrics.server_timing(total)}\n\n")
+        pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(getattr(settings, "REQUEST_PROFILE_LIMIT", 60))
+        response = HttpResponse(out.getvalue(), content_type="text/plain; charset=utf-8")
+        response["Server-Timing"] = metrics.server_timing(total)
+        return response
+
+
+def _is_staff(request):
+    """
+    Сотрудник ли автор запроса: по сессии или по аутентификаторам DRF из настроек
+    (middleware работает до view, где DRF сам определяет пользователя).
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return False
+    return bool(user and user.is_staff)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Чтения безопасных запросов (GET/HEAD/OPTIONS) — с реплики (PrimaryReplicaRouter).
+    Изменяющие запросы целиком работают с основной БД. После записи клиент получает
+    cookie на DATABASE_REPLICA_PIN_SECONDS: пока реплика догоняет, его чтения тоже
+    идут в основную БД, и он сразу видит свои изменения.
+    """
+
+    cookie_name = "db_pin"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_aliases():
+            return self.get_response(request)
+
+        pinned = request.method not in SAFE_METHODS or self.cookie_name in request.COOKIES
+        with routing(pinned=pinned) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name, "1",
+                max_age=getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 5),
+                httponly=True, samesite="Lax",
+            )
+        return response
@@ -0,0 +1,237 @@
+import base64
+import json
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) пагинация: следующая страница выбирается условием
+    WHERE (field, id) > (последнее значение, последний id), а не OFFSET,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+
+    Порядок берётся из queryset (view.ordering / OrderingFilter / фильтр),
+    к нему всегда добавляется id как уникальный ключ.
+    Курсор — base64 от значений полей сортировки последней строки.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        self.nullable = {
+            field.lstrip("-") for field in self.ordering
+            if self._is_nullable(queryset.model, field.lstrip("-"))
+        }
+
+        queryset = queryset.order_by(*(self._order_expression(field) for field in self.ordering))
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor, queryset.model)))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset, view):
+        ordering = list(queryset.query.order_by) or list(getattr(view, "ordering", None) or ["-id"])
+        ordering = [field if isinstance(field, str) else None for field in ordering]
+        ordering = [field.replace("pk", "id") if field.lstrip("-") == "pk" else field for field in ordering if field]
+
+        names = [field.lstrip("-") for field in ordering]
+        if "id" in names:
+            ordering = ordering[:names.index("id") + 1]
+        else:
+            # уникальный хвост — id в том же направлении, что и последнее поле
+            ordering.append("-id" if ordering and ordering[-1].startswith("-") else "id")
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        values = [self._value(self.last, field.lstrip("-")) for field in self.ordering]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values))
+
+    def encode_cursor(self, values):
+        raw = json.dumps(values, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor, model):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError("cursor does not match ordering")
+            return [
+                self._to_python(model, field.lstrip("-"), value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+    def _after(self, values):
+        """
+        Лексикографическое «после»: (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+        NULL считается меньше любого значения (NULLS FIRST при ASC, NULLS LAST при DESC).
+        """
+        terms = []
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            descending = field.startswith("-")
+            value = values[i]
+
+            if value is None:
+                step = None if descending else Q(**{f"{name}__isnull": False})
+            elif descending:
+                step = Q(**{f"{name}__lt": value})
+                if name in self.nullable:
+                    step |= Q(**{f"{name}__isnull": True})
+            else:
+                step = Q(**{f"{name}__gt": value})
+
+            if step is not None:
+                equal = [self._equal(f.lstrip("-"), v) for f, v in zip(self.ordering[:i], values[:i])]
+                terms.append(reduce(and_, equal + [step]))
+
+        if not terms:
+            return Q(pk__in=[])
+        after = reduce(or_, terms)
+
+        # избыточная граница по первому полю, чтобы БД начала с поиска по индексу, а не со сканирования
+        first = self.ordering[0].lstrip("-")
+        if values[0] is not None and first not in self.nullable:
+            lookup = "lte" if self.ordering[0].startswith("-") else "gte"
+            after &= Q(**{f"{first}__{lookup}": values[0]})
+        return after
+
+    @staticmethod
+    def _equal(name, value):
+        if value is None:
+            return Q(**{f"{name}__isnull": True})
+        return Q(**{name: value})
+
+    def _order_expression(self, field):
+        name = field.lstrip("-")
+        if name not in self.nullable:
+            # NOT NULL колонка — обычный ORDER BY, чтобы работал индекс
+            return field
+        if field.startswith("-"):
+            return F(name).desc(nulls_last=True)
+        return F(name).asc(nulls_first=True)
+
+    @staticmethod
+    def _is_nullable(model, name):
+        if "__" in name:
+            return True
+        try:
+            return model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            return True
+
+    @staticmethod
+    def _value(obj, name):
+        if isinstance(obj, dict):
+            # строки .values() (быстрый путь списков)
+            return obj.get(name)
+        value = obj
+        for part in name.split("__"):
+            value = getattr(value, part, None)
+            if value is None:
+                return None
+        return value
+
+    @staticmethod
+    def _to_python(model, name, value):
+        if value is None or "__" in name:
+            return value
+        try:
+            return model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            # аннотация (например, distance_sq)
+            return value
+
+
+def count_from(rows, queryset):
+    """
+    Считать число строк страницы по queryset, а не по rows.
+    values() со связанными колонками (region__name и т. п.) тянет JOIN и в COUNT(*),
+    хотя число строк от них не зависит: на 100k объектов это ~65 мс против ~5 мс.
+    """
+    rows.count_source = queryset
+    return rows
+
+
+class CountingPaginator(Paginator):
+    @cached_property
+    def count(self):
+        source = getattr(self.object_list, "count_source", None)
+        if source is not None:
+            return source.count()
+        return super().count
+
+
+class StandardPagination(PageNumberPagination):
+    """
+    Пагинация по умолчанию для всех списков: ?page=&page_size=.
+    С ?cursor=... или ?pagination=cursor включается keyset-режим (KeysetPagination).
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    keyset_class = KeysetPagination
+    django_paginator_class = CountingPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params or \
+                request.query_params.get("pagination") == "cursor":
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
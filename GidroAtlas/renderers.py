@@ -0,0 +1,25 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON через orjson: в несколько раз быстрее json.dumps на больших списках.
+    Типы, которых orjson не знает (Decimal, lazy-строки и т. п.), отдаются
+    стандартному кодировщику DRF, поэтому ответ совпадает с JSONRenderer.
+    С ?indent / Accept: ...; indent=N — обычный JSONRenderer.
+    """
+
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self._encoder.default)
+        # как и JSONRenderer, экранируем разделители строк, недопустимые в JavaScript
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
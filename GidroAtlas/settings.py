@@ -54,6 +54,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # до сессий и аутентификации: их чтения тоже идут через маршрутизатор реплик
+    'GidroAtlas.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,8 +63,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # после AuthenticationMiddleware: профилирование по заголовку доступно только сотрудникам
+    'GidroAtlas.middleware.RequestMetricsMiddleware',
 ]
 
+# Метрики запросов (Server-Timing, /api/metrics/) и профилирование по заголовку X-Profile
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', '1') == '1'
+REQUEST_METRICS_WINDOW = int(os.getenv('REQUEST_METRICS_WINDOW', '1000'))
+REQUEST_PROFILE_HEADER = 'X-Profile'
+REQUEST_PROFILE_LIMIT = 60
+
 ROOT_URLCONF = 'GidroAtlas.urls'
 
 TEMPLATES = [
@@ -86,10 +96,87 @@ WSGI_APPLICATION = 'GidroAtlas.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# DB_ENGINE=postgresql — PostgreSQL из переменных DB_*, по умолчанию SQLite (db.sqlite3).
+# Реплика для чтений включается DB_REPLICA_HOST (PostgreSQL) или DB_REPLICA_NAME
+# (SQLite, например копия db.sqlite3 для локальной проверки); остальные DB_REPLICA_*
+# по умолчанию берутся из DB_*.
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+
+def _db_env(prefix, key, default=None):
+    return os.getenv(f'{prefix}_{key}') or os.getenv(f'DB_{key}', default)
+
+
+def _database(prefix):
+    if DB_ENGINE == 'postgresql':
+        config = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': _db_env(prefix, 'NAME', 'gidroatlas'),
+            'USER': _db_env(prefix, 'USER', 'gidroatlas'),
+            'PASSWORD': _db_env(prefix, 'PASSWORD', ''),
+            'HOST': _db_env(prefix, 'HOST', 'localhost'),
+            'PORT': _db_env(prefix, 'PORT', '5432'),
+            # проверка соединения перед повторным использованием (после рестарта БД и т.п.)
+            'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() in ('true', '1', 'yes'),
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+            },
+        }
+        pool_size = int(os.getenv('DB_POOL_MAX_SIZE', '0'))
+        if pool_size:
+            # пул psycopg на процесс; несовместим с постоянными соединениями (CONN_MAX_AGE)
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS']['pool'] = {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+                'max_size': pool_size,
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            }
+        else:
+            config['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+        return config
+
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': _db_env(prefix, 'NAME', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # WAL: чтения не ждут записи; IMMEDIATE: транзакция сразу берёт блокировку
+            # записи и ждёт её до timeout, а не падает с "database is locked" посреди работы
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': int(os.getenv('DB_TIMEOUT', '20')),
+        },
+    }
+
+
 DATABASES = {
+    'default': _database('DB'),
+}
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **_database('DB_REPLICA'),
+        # в тестах реплика — та же тестовая БД
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['GidroAtlas.db_router.PrimaryReplicaRouter']
+# Псевдонимы реплик для чтений безопасных запросов (GidroAtlas/db_router.py)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Сколько секунд после записи чтения клиента идут в основную БД (отставание реплики)
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# Файловый кэш по умолчанию общий для всех воркеров на сервере (тайлы карты и т.п.)
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', '3600')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+        },
     }
 }
 
@@ -143,6 +230,9 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
     ],
+    # Все списки постраничные; ?pagination=cursor / ?cursor= — keyset-режим без OFFSET
+    'DEFAULT_PAGINATION_CLASS': 'GidroAtlas.pagination.StandardPagination',
+    'PAGE_SIZE': 50,
 }
 
 SPECTACULAR_SETTINGS = {
@@ -169,6 +259,23 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@gidroatlas.info')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '')
+OPENROUTER_URL = os.getenv('OPENROUTER_URL', 'https://openrouter.ai/api/v1/chat/completions')
+OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'kwaipilot/kat-coder-pro:free')
+# Сколько запросов к ИИ выполняется одновременно
+AI_RISK_MAX_WORKERS = int(os.getenv('AI_RISK_MAX_WORKERS', '8'))
+# Через сколько дней сохранённый ответ ИИ считается устаревшим даже без изменений объекта
+AI_RISK_TTL_DAYS = int(os.getenv('AI_RISK_TTL_DAYS', '30'))
+
+# Активная версия формулы приоритета (реестр в Atla/services/priority.py)
+PRIORITY_FORMULA_VERSION = os.getenv('PRIORITY_FORMULA_VERSION', 'v1')
+# Пересчёт приоритета после сохранения объекта: "on_commit" — пакетом после коммита,
+# "job" — фоновой задачей (manage.py run_jobs)
+PRIORITY_RECALC_MODE = os.getenv('PRIORITY_RECALC_MODE', 'on_commit')
+
+# Фоновые задачи: как часто воркер отмечает, что жив, и через сколько секунд без отметки
+# задача считается брошенной (повторяемые возвращаются в очередь, остальные — FAILED)
+JOB_HEARTBEAT_INTERVAL = int(os.getenv('JOB_HEARTBEAT_INTERVAL', '30'))
+JOB_STALE_TIMEOUT = int(os.getenv('JOB_STALE_TIMEOUT', '300'))
 
 # Custom user model
 AUTH_USER_MODEL = 'User.User'
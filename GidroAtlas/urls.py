@@ -25,6 +25,7 @@ from GidroAtlas import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/health/', views.health_check, name='health-check'),
+    path('api/metrics/', views.metrics, name='metrics'),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('user/', include('User.urls')),
@@ -1,7 +1,10 @@
 from drf_spectacular.utils import extend_schema, OpenApiTypes
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
+from GidroAtlas.middleware import registry
+
 
 @extend_schema(responses={200: OpenApiTypes.OBJECT})
 @api_view(["GET"])
@@ -13,3 +16,18 @@ def health_check(request):
             "service": "GidroAtlas",
         }
     )
+
+
+@extend_schema(responses={200: OpenApiTypes.OBJECT})
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """
+    Request metrics of this worker process grouped by URL name:
+    count, query counts, latency histogram and p50/p95/p99 for latency, DB and serializer time.
+    DELETE resets the counters.
+    """
+    if request.method == "DELETE":
+        registry.reset()
+        return Response(status=204)
+    return Response(registry.snapshot())
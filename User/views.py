@@ -143,7 +143,7 @@ class UserDetailView(RetrieveAPIView):
 
 
 class UserListView(generics.ListAPIView):
-    queryset = User.objects.all()
+    queryset = User.objects.order_by("id")
     serializer_class = UserProfileUpdateSerializer
     permission_classes = [AllowAny]
 